@@ -1,26 +1,142 @@
 import os
-import openai
-from typing import List, Dict, Any, Optional
+import time
+import queue
+import random
+import asyncio
+import threading
+import concurrent.futures
+from typing import List, Dict, Any, Optional, Iterator, Callable
 from dotenv import load_dotenv
+import response_cache
+import usage_ledger
+from rate_limiter import RateLimiter
+from scheduler import RequestScheduler, Ticket
 
 # Load environment variables from .env file
 load_dotenv()
 
-# Initialize the OpenAI client
+# HTTP transport settings. Connections are pooled and kept alive so repeated
+# requests reuse a warm TLS connection instead of paying for a new handshake.
+HTTP_MAX_CONNECTIONS = int(os.getenv("OPENAI_MAX_CONNECTIONS", "20"))
+HTTP_MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("OPENAI_MAX_KEEPALIVE_CONNECTIONS", "10"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("OPENAI_KEEPALIVE_EXPIRY", "120"))  # Seconds an idle connection is kept
+HTTP_CONNECT_TIMEOUT = float(os.getenv("OPENAI_CONNECT_TIMEOUT", "10"))
+HTTP_READ_TIMEOUT = float(os.getenv("OPENAI_READ_TIMEOUT", "300"))  # Long generations can take minutes
+HTTP2_ENABLED = os.getenv("OPENAI_HTTP2", "false").strip().lower() in ("1", "true", "yes")
+
+def build_http_client(use_async: bool = False):
+    """Build a pooled HTTP client for the OpenAI SDK from the settings above"""
+    import httpx
+    import openai
+    
+    http2 = HTTP2_ENABLED
+    if http2:
+        try:
+            import h2  # HTTP/2 support in httpx needs the optional h2 package
+        except ImportError:
+            print("Warning: OPENAI_HTTP2 is enabled but the 'h2' package is not installed. Falling back to HTTP/1.1.")
+            http2 = False
+    
+    limits = httpx.Limits(
+        max_connections=HTTP_MAX_CONNECTIONS,
+        max_keepalive_connections=HTTP_MAX_KEEPALIVE_CONNECTIONS,
+        keepalive_expiry=HTTP_KEEPALIVE_EXPIRY
+    )
+    timeout = httpx.Timeout(HTTP_READ_TIMEOUT, connect=HTTP_CONNECT_TIMEOUT)
+    
+    client_class = openai.DefaultAsyncHttpxClient if use_async else openai.DefaultHttpxClient
+    return client_class(limits=limits, timeout=timeout, http2=http2)
+
+# The OpenAI clients. The async client does all generation work on a shared
+# event loop thread, the sync client is only used for connection checks.
+# Importing the SDK (httpx, pydantic, anyio) takes a noticeable part of a
+# second, so it happens on first use or in warm_up(), not while the window opens.
 api_key = os.getenv("OPENAI_API_KEY")
 client = None
+async_client = None
+_clients_lock = threading.Lock()
+_clients_initialized = False
 
 if not api_key or api_key.strip() == "":
     print("Warning: OPENAI_API_KEY is empty or not found in environment variables.")
-    # Still initialize client to None explicitly for clarity
-    client = None
-else:
-    try:
-        client = openai.OpenAI(api_key=api_key)
-        print("OpenAI API client initialized successfully.")
-    except Exception as e:
-        print(f"Warning: OpenAI API initialization failed: {e}")
-        client = None
+
+def _init_clients():
+    """Import the OpenAI SDK and build both clients, once"""
+    global client, async_client, _clients_initialized
+    with _clients_lock:
+        if _clients_initialized:
+            return
+        
+        if api_key and api_key.strip() != "":
+            try:
+                import openai
+                client = openai.OpenAI(api_key=api_key, http_client=build_http_client())
+                # Retries are handled by ai_handler so they can share the rate limiter
+                async_client = openai.AsyncOpenAI(api_key=api_key, http_client=build_http_client(use_async=True), max_retries=0)
+                print("OpenAI API client initialized successfully.")
+            except Exception as e:
+                print(f"Warning: OpenAI API initialization failed: {e}")
+                client = None
+                async_client = None
+        
+        _clients_initialized = True
+
+def _get_client():
+    """The sync OpenAI client, or None if there is no usable API key"""
+    _init_clients()
+    return client
+
+def _get_async_client():
+    """The async OpenAI client, or None if there is no usable API key"""
+    _init_clients()
+    return async_client
+
+def warm_up():
+    """Import the SDK and build the clients in a background thread so the first request doesn't wait for it"""
+    if not _clients_initialized:
+        threading.Thread(target=_init_clients, name="ai-warm-up", daemon=True).start()
+
+# Maximum number of generation requests sent to the API at the same time, shared
+# by every page and batch job. Interactive requests are started before batch work.
+AI_MAX_CONCURRENT_REQUESTS = int(os.getenv("AI_MAX_CONCURRENT_REQUESTS", "4"))
+
+# Retry policy for rate limits, server errors and dropped connections
+API_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "5"))
+API_RETRY_BASE_DELAY = float(os.getenv("OPENAI_RETRY_BASE_DELAY", "1"))  # Seconds before the first retry
+API_RETRY_MAX_DELAY = float(os.getenv("OPENAI_RETRY_MAX_DELAY", "60"))
+
+# Client-side rate limits shared by every request (0 disables a limit)
+rate_limiter = RateLimiter(
+    requests_per_minute=float(os.getenv("OPENAI_RPM_LIMIT", "500")),
+    tokens_per_minute=float(os.getenv("OPENAI_TPM_LIMIT", "200000"))
+)
+
+# Connection health state, updated by every real API call so the pages can skip
+# the separate connection check while the last known state is still fresh
+API_HEALTH_TTL = float(os.getenv("API_HEALTH_TTL", "300"))  # Seconds a success is trusted
+API_HEALTH_FAILURE_TTL = float(os.getenv("API_HEALTH_FAILURE_TTL", "30"))  # Seconds a failure is trusted
+API_HEALTH_MAX_STALE = float(os.getenv("API_HEALTH_MAX_STALE", "3600"))  # Stale successes are used while revalidating
+
+# Messages returned (and streamed) in place of a response when a request fails
+CLIENT_NOT_INITIALIZED_ERROR = "Error: OpenAI API client not initialized"
+REQUEST_FAILED_ERROR = "Error generating response:"
+ERROR_PREFIXES = (CLIENT_NOT_INITIALIZED_ERROR, REQUEST_FAILED_ERROR)
+
+# Responses are cached on disk so identical requests don't cost a new API call
+RESPONSE_CACHE_ENABLED = os.getenv("RESPONSE_CACHE_ENABLED", "true").strip().lower() not in ("0", "false", "no")
+
+_health_lock = threading.Lock()
+_health_state = {"connected": None, "checked_at": 0.0, "revalidating": False}
+
+# Event loop thread shared by all generation requests, started on first use
+_loop_lock = threading.Lock()
+_loop = None
+_scheduler = None
+
+# Requests currently being sent to the API, by cache key. Identical requests
+# made while one is in flight wait for it instead of calling the API again.
+# Only used from the event loop thread.
+_in_flight = {}
 
 # Base system message that applies to all roles
 BASE_SYSTEM_MESSAGE = "IMPORTANT: All responses must use plain text formatting only. Use '*' or '-' for bullet points, capitalize headers, and use spacing to enhance readability. Do not use Markdown or HTML formatting as the text will be displayed in plain text. This also applies when writing scientific or mathematical equations - format them in plain text without using markdown syntax. Do not use '*' on both sides of a word to make it italic, and don't use '**' to make text bold, it won't work."
@@ -34,32 +150,8 @@ ROLE_SYSTEM_MESSAGES = {
     "assignment_starter": "You are an assignment starter helper for students. Based on the assignment description, subject, and assignment type, create an outline or starter content to help the student begin their work. Include key points to address, suggested structure, potential resources to explore, and initial ideas. The goal is to help overcome writer's block and provide a solid foundation, not to complete the assignment. Tailor your suggestions to the specific subject and assignment type."
 }
 
-def generate_response(
-    topic: str, 
-    context: str, 
-    role: str = "general",
-    model: str = None,
-    max_completion_tokens: int = None,
-    custom_system_message: str = None
-) -> str:
-    """
-    Generate a response from OpenAI API based on topic and context
-    
-    Parameters:
-    - topic: The main question or topic
-    - context: Additional context or information
-    - role: The role of the AI (general, note_taker, schedule_planner, assignment_helper)
-    - model: The OpenAI model to use
-    - max_completion_tokens: Maximum tokens in the response
-    - custom_system_message: Optional custom system message to override the role-based one
-    
-    Returns:
-    - The AI generated response as a string
-    """
-    if client is None:
-        return "Error: OpenAI API client not initialized. Please add your API key to the .env file and restart the application."
-    
-    # Get parameters from environment variables if not specified
+def resolve_model_settings(model: str = None, max_completion_tokens: int = None):
+    """Fill in the model and token limit from environment variables if not specified"""
     if model is None:
         model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
     
@@ -67,6 +159,24 @@ def generate_response(
         max_tokens_str = os.getenv("MAX_TOKENS", "1000")
         max_completion_tokens = int(max_tokens_str)
     
+    return model, max_completion_tokens
+
+def build_messages(
+    topic: str,
+    context: str,
+    role: str = "general",
+    custom_system_message: str = None,
+    system_context: str = None
+) -> List[Dict[str, str]]:
+    """
+    Compose the system and user messages sent to the API
+    
+    Everything that is shared between requests (base and role instructions,
+    then system_context such as subject descriptions) goes first, in the
+    system message, and the per-request text goes last. Requests with the same
+    role and system_context then start with a byte-identical prefix that the
+    API can serve from its prompt cache.
+    """
     # Get the appropriate system message based on role
     if custom_system_message:
         system_message = custom_system_message
@@ -75,32 +185,532 @@ def generate_response(
         role_message = ROLE_SYSTEM_MESSAGES.get(role, ROLE_SYSTEM_MESSAGES["general"])
         system_message = f"{BASE_SYSTEM_MESSAGE}\n\n{role_message}"
     
+    if system_context:
+        system_message = f"{system_message}\n\n{system_context}"
+    
     # Create the user message with topic and context
     user_message = f"Topic: {topic}\n\nContext: {context}"
     
-    # Create messages array
-    messages = [
+    return [
         {"role": "system", "content": system_message},
         {"role": "user", "content": user_message}
     ]
+
+def get_event_loop() -> asyncio.AbstractEventLoop:
+    """Get the shared event loop, starting its thread on first use"""
+    global _loop, _scheduler
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            _scheduler = RequestScheduler(AI_MAX_CONCURRENT_REQUESTS)
+            
+            loop_thread = threading.Thread(target=_loop.run_forever, name="ai-event-loop")
+            loop_thread.daemon = True
+            loop_thread.start()
+    return _loop
+
+def set_max_concurrent_requests(limit: int):
+    """
+    Change how many requests are sent to the API at the same time
     
-    try:
-        # Make the API call
-        response = client.chat.completions.create(
-            model=model,
-            messages=messages,
-            max_completion_tokens=max_completion_tokens
+    Takes effect immediately, also for requests that are already waiting.
+    The connection pool is enlarged to match if the clients haven't been built
+    yet, otherwise requests beyond OPENAI_MAX_CONNECTIONS wait for a connection.
+    """
+    global AI_MAX_CONCURRENT_REQUESTS, HTTP_MAX_CONNECTIONS
+    limit = max(1, limit)
+    
+    with _clients_lock:
+        if limit > HTTP_MAX_CONNECTIONS:
+            if _clients_initialized:
+                print(f"Warning: only {HTTP_MAX_CONNECTIONS} connections are open to the API (OPENAI_MAX_CONNECTIONS), "
+                      f"so at most {HTTP_MAX_CONNECTIONS} of {limit} concurrent requests can run at a time.")
+            else:
+                HTTP_MAX_CONNECTIONS = limit
+    
+    with _loop_lock:
+        AI_MAX_CONCURRENT_REQUESTS = limit
+        if _loop is not None:
+            _loop.call_soon_threadsafe(_scheduler.set_max_concurrent, limit)
+
+def submit(coroutine) -> concurrent.futures.Future:
+    """Run a coroutine on the shared event loop and return a future for its result"""
+    return asyncio.run_coroutine_threadsafe(coroutine, get_event_loop())
+
+async def agenerate_response(
+    topic: str, 
+    context: str, 
+    role: str = "general",
+    model: str = None,
+    max_completion_tokens: int = None,
+    custom_system_message: str = None,
+    use_cache: bool = True,
+    on_delta: Callable[[str], None] = None,
+    tags: Dict[str, str] = None,
+    system_context: str = None,
+    priority: str = "interactive",
+    source: str = None,
+    on_queue: Callable[[Optional[int], Optional[float]], None] = None,
+    raise_errors: bool = False
+) -> str:
+    """
+    Generate a response on the shared event loop
+    
+    Takes the same parameters as generate_response. If on_delta is given the
+    response is streamed and on_delta is called from the event loop thread with
+    each text delta as it arrives (errors are passed to it as a final delta too).
+    While the request waits for a free slot, on_queue(requests_ahead,
+    seconds_estimate) is called from the event loop thread whenever its place
+    in the queue changes, and on_queue(None, None) once it starts. Failures are
+    returned as an error message starting with one of ERROR_PREFIXES, or raised
+    if raise_errors is true.
+    
+    Returns:
+    - The complete AI generated response as a string
+    """
+    def emit(text):
+        if on_delta and text:
+            on_delta(text)
+        return text
+    
+    if _get_async_client() is None:
+        message = f"{CLIENT_NOT_INITIALIZED_ERROR}. Please add your API key to the .env file and restart the application."
+        if raise_errors:
+            raise RuntimeError(message)
+        return emit(message)
+    
+    model, max_completion_tokens = resolve_model_settings(model, max_completion_tokens)
+    messages = build_messages(topic, context, role, custom_system_message, system_context)
+    
+    # Filled in along the way and written to the usage ledger at the end
+    tags = tags or {}
+    call = {
+        "started_at": time.time(),
+        "model": model,
+        "role": role,
+        "subject": tags.get("subject"),
+        "assignment_type": tags.get("assignment_type"),
+        "streamed": on_delta is not None,
+        "attempts": 0
+    }
+    start = time.perf_counter()
+    
+    cache_key = response_cache.make_key(model, max_completion_tokens, messages)
+    use_cache = use_cache and RESPONSE_CACHE_ENABLED
+    if use_cache:
+        # SQLite reads block, so they run on a worker thread instead of stalling every other request
+        cached_response = await asyncio.get_running_loop().run_in_executor(None, response_cache.get, cache_key)
+        if cached_response is not None:
+            record_usage(call, start, "cache_hit")
+            return emit(cached_response)
+    
+    # Join an identical request that is already in flight, or start one
+    flight = _in_flight.get(cache_key)
+    if flight is None or not flight.joinable():
+        flight = RequestFlight(streamed=on_delta is not None)
+        flight.ticket = Ticket(priority, source or role, on_update=flight.broadcast_queue)
+        flight.task = asyncio.ensure_future(
+            _send_request(flight, model, messages, max_completion_tokens, call, start, use_cache, cache_key)
         )
+        _in_flight[cache_key] = flight
+        flight.task.add_done_callback(lambda _: _in_flight.pop(cache_key, None) if _in_flight.get(cache_key) is flight else None)
+        shared = False
+    else:
+        shared = True
+        # Someone waiting on a batch request makes it interactive
+        _scheduler.promote(flight.ticket, priority)
+    
+    flight.waiters += 1
+    if on_queue:
+        if flight.queue_status is not None:
+            on_queue(*flight.queue_status)
+        flight.queue_listeners.append(on_queue)
+    if on_delta and flight.streamed:
+        # Catch up on what was already streamed, then receive the rest live
+        if flight.parts:
+            on_delta("".join(flight.parts))
+        flight.subscribers.append(on_delta)
+    
+    try:
+        response_text = await asyncio.shield(flight.task)
+        if shared:
+            record_usage(call, start, "shared")
+            if not flight.streamed:
+                emit(response_text)
+        return response_text
+    except asyncio.CancelledError:
+        # The request is only cancelled once nobody is waiting for it anymore
+        flight.waiters -= 1
+        if on_delta in flight.subscribers:
+            flight.subscribers.remove(on_delta)
+        if on_queue in flight.queue_listeners:
+            flight.queue_listeners.remove(on_queue)
+        if flight.waiters == 0:
+            # Forget the flight first, so an identical request made before the task
+            # has finished cancelling starts a new one instead of joining this one
+            if _in_flight.get(cache_key) is flight:
+                del _in_flight[cache_key]
+            flight.task.cancel()
+        raise
+    except Exception as e:
+        if flight.streamed and on_delta in flight.subscribers:
+            flight.subscribers.remove(on_delta)
+        if raise_errors:
+            raise
+        return emit(f"{REQUEST_FAILED_ERROR} {str(e)}")
+
+class RequestFlight:
+    """An API request shared by every identical request made while it runs"""
+    
+    def __init__(self, streamed: bool):
+        self.task = None
+        self.streamed = streamed  # Streaming if the request that started it was
+        self.parts = []  # Text streamed so far, replayed to late subscribers
+        self.subscribers = []  # on_delta callbacks of the waiting requests
+        self.ticket = None  # Place in the scheduler queue
+        self.queue_status = None  # Latest (requests ahead, seconds estimate)
+        self.queue_listeners = []  # on_queue callbacks of the waiting requests
+        self.waiters = 0
+    
+    def joinable(self) -> bool:
+        """Whether the request is still running and not being cancelled"""
+        if self.task.done():
+            return False
+        cancelling = getattr(self.task, "cancelling", None)  # Python 3.11+
+        return not (cancelling and cancelling())
+    
+    def broadcast(self, delta: str):
+        self.parts.append(delta)
+        for on_delta in list(self.subscribers):
+            on_delta(delta)
+    
+    def broadcast_queue(self, position: Optional[int], eta: Optional[float]):
+        self.queue_status = (position, eta)
+        for on_queue in list(self.queue_listeners):
+            on_queue(position, eta)
+
+async def _send_request(flight, model, messages, max_completion_tokens, call, start, use_cache, cache_key) -> str:
+    """Send a request to the API for everyone waiting on the flight, recording its usage once"""
+    on_delta = flight.broadcast if flight.streamed else None
+    try:
+        await _scheduler.acquire(flight.ticket)
+        try:
+            response_text = await _complete_with_retries(model, messages, max_completion_tokens, on_delta, call, flight.ticket)
+        finally:
+            _scheduler.release(flight.ticket)
+        record_usage(call, start, "ok")
         
-        # Extract and return the response text
-        return response.choices[0].message.content or ""
+        # Only complete responses are cached
+        if use_cache and response_text:
+            response_cache.put(cache_key, response_text)
+        return response_text
+    except asyncio.CancelledError:
+        record_usage(call, start, "cancelled")
+        raise
     except Exception as e:
-        return f"Error generating response: {str(e)}"
+        record_usage(call, start, "error", error=e.__class__.__name__)
+        if is_connection_failure(e):
+            record_api_health(False)
+        raise
+
+def record_usage(call: Dict[str, Any], start: float, outcome: str, error: str = None):
+    """Write a finished call to the usage ledger"""
+    call["outcome"] = outcome
+    call["error"] = error
+    call["latency_ms"] = (time.perf_counter() - start) * 1000
+    first_token_at = call.pop("first_token_at", None)
+    if first_token_at is not None:
+        call["ttft_ms"] = (first_token_at - start) * 1000
+    
+    usage = call.pop("usage", None)
+    if usage is not None:
+        call["prompt_tokens"] = usage.prompt_tokens
+        call["completion_tokens"] = usage.completion_tokens
+        details = getattr(usage, "prompt_tokens_details", None)
+        call["cached_tokens"] = (getattr(details, "cached_tokens", None) or 0) if details else 0
+    
+    usage_ledger.record(**call)
+
+def estimate_tokens(messages: List[Dict[str, str]]) -> int:
+    """Rough prompt size in tokens (about 4 characters per token)"""
+    return sum(len(message["content"]) for message in messages) // 4 + 4 * len(messages)
+
+def is_retryable(error: Exception) -> bool:
+    """Whether an API error is likely to go away if the request is sent again"""
+    import openai
+    
+    if isinstance(error, (openai.RateLimitError, openai.APIConnectionError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in (408, 409) or error.status_code >= 500
+    return False
+
+def get_retry_delay(error: Exception, attempt: int) -> float:
+    """Seconds to wait before retrying, honouring Retry-After headers from the API"""
+    response = getattr(error, "response", None)
+    if response is not None:
+        retry_after_ms = response.headers.get("retry-after-ms")
+        retry_after = response.headers.get("retry-after")
+        try:
+            if retry_after_ms is not None:
+                return min(float(retry_after_ms) / 1000, API_RETRY_MAX_DELAY)
+            if retry_after is not None:
+                return min(float(retry_after), API_RETRY_MAX_DELAY)
+        except ValueError:
+            pass  # Retry-After given as an HTTP date, fall back to backoff
+    
+    # Exponential backoff with full jitter so waiting clients don't retry in lockstep
+    return random.uniform(0, min(API_RETRY_MAX_DELAY, API_RETRY_BASE_DELAY * 2 ** attempt))
+
+async def _wait_without_slot(ticket: Ticket, seconds: float):
+    """Sleep with the request's scheduler slot handed back, so other requests can run meanwhile"""
+    _scheduler.release(ticket, finished=False)
+    await asyncio.sleep(seconds)
+    await _scheduler.acquire(ticket)
+
+async def _complete_with_retries(model, messages, max_completion_tokens, on_delta, call, ticket) -> str:
+    """
+    Run a completion through the rate limiter, retrying transient failures
+    
+    The request holds a scheduler slot (ticket) while it runs, but gives it
+    back while it waits for the rate limiter or before a retry, so waiting
+    requests of a higher priority aren't held up by it.
+    """
+    # Reserve the worst case for each attempt, what it didn't use is refunded afterwards
+    prompt_tokens = estimate_tokens(messages)
+    reserved_tokens = prompt_tokens + max_completion_tokens
+    
+    attempt = 0
+    while True:
+        wait = rate_limiter.wait_time(reserved_tokens)
+        while wait > 0:
+            await _wait_without_slot(ticket, wait)
+            wait = rate_limiter.wait_time(reserved_tokens)
+        await rate_limiter.acquire(reserved_tokens)
+        call["attempts"] += 1
+        
+        streamed_parts = []
+        def track_delta(delta):
+            if not streamed_parts:
+                call["first_token_at"] = time.perf_counter()
+            streamed_parts.append(delta)
+            on_delta(delta)
+        
+        try:
+            if on_delta:
+                response_text = await _stream_completion(model, messages, max_completion_tokens, track_delta, call)
+            else:
+                # Make the API call
+                response = await _get_async_client().chat.completions.create(
+                    model=model,
+                    messages=messages,
+                    max_completion_tokens=max_completion_tokens
+                )
+                record_api_health(True)
+                
+                if response.usage:
+                    call["usage"] = response.usage
+                
+                # Extract the response text
+                response_text = response.choices[0].message.content or ""
+            
+            rate_limiter.refund_tokens(reserved_tokens - used_tokens(call, prompt_tokens, response_text))
+            return response_text
+        except asyncio.CancelledError:
+            rate_limiter.refund_tokens(reserved_tokens - failed_attempt_tokens(prompt_tokens, streamed_parts))
+            raise
+        except Exception as e:
+            rate_limiter.refund_tokens(reserved_tokens - failed_attempt_tokens(prompt_tokens, streamed_parts))
+            
+            # A stream that already produced text can't be retried without repeating it
+            if streamed_parts or attempt >= API_MAX_RETRIES or not is_retryable(e):
+                raise
+            
+            delay = get_retry_delay(e, attempt)
+            import openai
+            if isinstance(e, openai.RateLimitError):
+                # Everyone sharing the key backs off, not just this request
+                rate_limiter.pause(delay)
+            
+            attempt += 1
+            print(f"API request failed ({e.__class__.__name__}), retrying in {delay:.1f}s (attempt {attempt}/{API_MAX_RETRIES})")
+            await _wait_without_slot(ticket, delay)
+
+def used_tokens(call: Dict[str, Any], prompt_tokens: int, response_text: str) -> int:
+    """Tokens a finished attempt used, estimated from the text if the API didn't report usage"""
+    usage = call.get("usage")
+    if usage is not None:
+        return usage.total_tokens
+    return prompt_tokens + len(response_text) // 4
+
+def failed_attempt_tokens(prompt_tokens: int, streamed_parts: List[str]) -> int:
+    """Tokens a failed or cancelled attempt used: nothing, unless it had started streaming"""
+    if not streamed_parts:
+        return 0
+    return prompt_tokens + sum(len(part) for part in streamed_parts) // 4
+
+async def _stream_completion(model, messages, max_completion_tokens, on_delta, call) -> str:
+    """Stream a completion, passing each delta to on_delta, and return the full text"""
+    stream = await _get_async_client().chat.completions.create(
+        model=model,
+        messages=messages,
+        max_completion_tokens=max_completion_tokens,
+        stream=True,
+        stream_options={"include_usage": True}  # Token usage arrives in a final chunk without choices
+    )
+    record_api_health(True)
+    
+    response_parts = []
+    async with stream:
+        async for chunk in stream:
+            if chunk.usage:
+                call["usage"] = chunk.usage
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                response_parts.append(delta)
+                on_delta(delta)
+    return "".join(response_parts)
+
+def submit_response(
+    topic: str, 
+    context: str, 
+    role: str = "general",
+    model: str = None,
+    max_completion_tokens: int = None,
+    custom_system_message: str = None,
+    use_cache: bool = True,
+    on_delta: Callable[[str], None] = None,
+    tags: Dict[str, str] = None,
+    system_context: str = None,
+    priority: str = "interactive",
+    source: str = None,
+    on_queue: Callable[[Optional[int], Optional[float]], None] = None,
+    raise_errors: bool = False
+) -> concurrent.futures.Future:
+    """
+    Start generating a response in the background
+    
+    Takes the same parameters as agenerate_response. The returned future can be
+    polled from the Tk main loop with after(), and cancelling it cancels the
+    request that is in flight.
+    """
+    return submit(agenerate_response(
+        topic=topic,
+        context=context,
+        role=role,
+        model=model,
+        max_completion_tokens=max_completion_tokens,
+        custom_system_message=custom_system_message,
+        use_cache=use_cache,
+        on_delta=on_delta,
+        tags=tags,
+        system_context=system_context,
+        priority=priority,
+        source=source,
+        on_queue=on_queue,
+        raise_errors=raise_errors
+    ))
+
+def generate_response(
+    topic: str, 
+    context: str, 
+    role: str = "general",
+    model: str = None,
+    max_completion_tokens: int = None,
+    custom_system_message: str = None,
+    use_cache: bool = True,
+    tags: Dict[str, str] = None,
+    system_context: str = None,
+    priority: str = "interactive",
+    source: str = None
+) -> str:
+    """
+    Generate a response from OpenAI API based on topic and context
+    
+    Parameters:
+    - topic: The main question or topic
+    - context: Additional context or information
+    - role: The role of the AI (general, note_taker, schedule_planner, assignment_helper)
+    - model: The OpenAI model to use
+    - max_completion_tokens: Maximum tokens in the response
+    - custom_system_message: Optional custom system message to override the role-based one
+    - use_cache: Whether to reuse a cached response for an identical request
+    - tags: Optional "subject" and "assignment_type" recorded in the usage ledger
+    - system_context: Background shared by many requests (e.g. subject descriptions), sent in the system message
+    - priority: "interactive" for requests someone is waiting on, "batch" for background work
+    - source: What is making the request (defaults to the role), requests are started in turn per source
+    
+    Returns:
+    - The AI generated response as a string
+    """
+    return submit_response(
+        topic=topic,
+        context=context,
+        role=role,
+        model=model,
+        max_completion_tokens=max_completion_tokens,
+        custom_system_message=custom_system_message,
+        use_cache=use_cache,
+        tags=tags,
+        system_context=system_context,
+        priority=priority,
+        source=source
+    ).result()
+
+def generate_response_stream(
+    topic: str, 
+    context: str, 
+    role: str = "general",
+    model: str = None,
+    max_completion_tokens: int = None,
+    custom_system_message: str = None,
+    use_cache: bool = True,
+    tags: Dict[str, str] = None,
+    system_context: str = None,
+    priority: str = "interactive",
+    source: str = None
+) -> Iterator[str]:
+    """
+    Stream a response from OpenAI API, yielding text deltas as they arrive
+    
+    Takes the same parameters as generate_response. Errors are yielded as a
+    final "Error generating response: ..." delta so callers can render them
+    like any other text. Closing the generator early cancels the request.
+    """
+    deltas = queue.Queue()
+    future = submit_response(
+        topic=topic,
+        context=context,
+        role=role,
+        model=model,
+        max_completion_tokens=max_completion_tokens,
+        custom_system_message=custom_system_message,
+        use_cache=use_cache,
+        on_delta=deltas.put,
+        tags=tags,
+        system_context=system_context,
+        priority=priority,
+        source=source
+    )
+    future.add_done_callback(lambda _: deltas.put(None))
+    
+    try:
+        while True:
+            delta = deltas.get()
+            if delta is None:
+                break
+            yield delta
+        future.result()
+    finally:
+        future.cancel()
 
 # Function to test if the API key is valid
 def test_api_connection() -> bool:
     """Test if the connection to OpenAI API is working"""
     # If we already know the client is None, return False immediately
+    client = _get_client()
     if client is None:
         print("API client not initialized - API key may be missing or empty")
         return False
@@ -110,6 +720,8 @@ def test_api_connection() -> bool:
         print("API key is empty or not found")
         return False
     
+    import openai
+    
     try:
         # Make a simple API call
         response = client.chat.completions.create(
@@ -117,16 +729,84 @@ def test_api_connection() -> bool:
             messages=[{"role": "user", "content": "Hello!"}],
             max_tokens=5
         )
+        record_api_health(True)
         return True
     except openai.AuthenticationError as e:
         print(f"API authentication failed: {e}")
+        record_api_health(False)
         return False
     except openai.RateLimitError as e:
         print(f"API rate limit exceeded: {e}")
+        record_api_health(False)
         return False
     except openai.APIConnectionError as e:
         print(f"API connection error: {e}")
+        record_api_health(False)
         return False
     except Exception as e:
         print(f"API connection test failed with unknown error: {e}")
-        return False 
\ No newline at end of file
+        record_api_health(False)
+        return False
+
+def record_api_health(connected: bool):
+    """Record the outcome of an API call in the shared connection health state"""
+    with _health_lock:
+        _health_state["connected"] = connected
+        _health_state["checked_at"] = time.monotonic()
+
+def is_connection_failure(error: Exception) -> bool:
+    """Whether an API error means the API is unreachable or the key is unusable"""
+    import openai
+    
+    return isinstance(error, (openai.AuthenticationError, openai.PermissionDeniedError, openai.APIConnectionError))
+
+def get_cached_api_health() -> Optional[bool]:
+    """
+    Get the cached API connection state without making a request
+    
+    Returns True or False while the last recorded state is fresh. A stale
+    success is still returned (and revalidated in the background) until it
+    is older than API_HEALTH_MAX_STALE. Returns None when the state is
+    unknown and a blocking check is needed.
+    """
+    if not api_key or api_key.strip() == "":
+        return False
+    if _clients_initialized and client is None:
+        return False  # The key is set but the client couldn't be built
+    
+    with _health_lock:
+        connected = _health_state["connected"]
+        age = time.monotonic() - _health_state["checked_at"]
+    
+    if connected is None:
+        return None
+    
+    if connected:
+        if age < API_HEALTH_TTL:
+            return True
+        if age < API_HEALTH_MAX_STALE:
+            revalidate_api_health()
+            return True
+        return None
+    
+    if age < API_HEALTH_FAILURE_TTL:
+        return False
+    return None
+
+def revalidate_api_health():
+    """Refresh the cached connection state in a background thread"""
+    with _health_lock:
+        if _health_state["revalidating"]:
+            return
+        _health_state["revalidating"] = True
+    
+    def revalidate():
+        try:
+            test_api_connection()
+        finally:
+            with _health_lock:
+                _health_state["revalidating"] = False
+    
+    thread = threading.Thread(target=revalidate)
+    thread.daemon = True
+    thread.start()
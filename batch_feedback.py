@@ -0,0 +1,199 @@
+"""
+Generate feedback for a whole folder of assignments from the command line
+
+Every assignment file in the folder gets feedback for the given subject and
+assignment type, saved either as a text file next to the others or as a note
+in the program. Requests run concurrently up to the configured limits, and
+finished files are recorded in a checkpoint file so an interrupted run picks
+up where it stopped when started again. Example:
+
+    python batch_feedback.py assignments/ --subject Physics --type "Lab Report"
+    python batch_feedback.py assignments/ --subject Physics --type Essay --output notes
+"""
+import os
+import sys
+import glob
+import json
+import time
+import hashlib
+import argparse
+import concurrent.futures
+import ai_handler
+import subjects
+import assignment_types
+import services
+import persistence
+
+CHECKPOINT_FILE = ".feedback_checkpoint.json"
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("directory", help="Folder with one assignment per file")
+    parser.add_argument("--subject", required=True, help="Subject name, as listed in the program")
+    parser.add_argument("--type", required=True, dest="assignment_type", help="Assignment type name, as listed in the program")
+    parser.add_argument("--pattern", default="*.txt", help="Which files in the folder to read (default: *.txt)")
+    parser.add_argument("--output", choices=["files", "notes"], default="files", help="Save feedback as text files or as notes (default: files)")
+    parser.add_argument("--output-dir", help="Folder for feedback files (default: a 'feedback' folder inside the assignment folder)")
+    parser.add_argument("--concurrency", type=int, default=ai_handler.AI_MAX_CONCURRENT_REQUESTS,
+                        help=f"Requests sent at the same time (default: AI_MAX_CONCURRENT_REQUESTS, {ai_handler.AI_MAX_CONCURRENT_REQUESTS})")
+    parser.add_argument("--checkpoint", help=f"Checkpoint file (default: {CHECKPOINT_FILE} in the assignment folder)")
+    parser.add_argument("--restart", action="store_true", help="Ignore the checkpoint and process every file again")
+    return parser.parse_args()
+
+def find_by_name(name, names, get_by_name):
+    """Look a name up exactly, or ignoring case if that is unambiguous"""
+    record = get_by_name(name)
+    if record:
+        return record
+    matches = [candidate for candidate in names if candidate.lower() == name.lower()]
+    return get_by_name(matches[0]) if len(matches) == 1 else None
+
+def resolve_names(subject_name, assignment_type_name):
+    """Match the names given on the command line to the program's subjects and assignment types"""
+    subject = find_by_name(subject_name, subjects.get_subject_names(), subjects.get_subject_by_name)
+    if not subject:
+        sys.exit(f"Unknown subject '{subject_name}'. Available: {', '.join(subjects.get_subject_names())}")
+    
+    assignment_type = find_by_name(assignment_type_name, assignment_types.get_assignment_type_names(), assignment_types.get_assignment_type_by_name)
+    if not assignment_type:
+        sys.exit(f"Unknown assignment type '{assignment_type_name}'. Available: {', '.join(assignment_types.get_assignment_type_names())}")
+    
+    return subject["name"], assignment_type["name"]
+
+def load_checkpoint(checkpoint_path, subject_name, assignment_type_name):
+    """Files already finished by an earlier run with the same subject and assignment type"""
+    try:
+        with open(checkpoint_path, 'r', encoding='utf-8') as f:
+            checkpoint = json.load(f)
+    except (FileNotFoundError, json.JSONDecodeError):
+        return {}
+    
+    if not checkpoint or checkpoint.get("subject") != subject_name or checkpoint.get("assignment_type") != assignment_type_name:
+        return {}
+    return checkpoint.get("completed", {})
+
+def save_checkpoint(checkpoint_path, subject_name, assignment_type_name, completed):
+    persistence.atomic_write_json(checkpoint_path, {
+        "subject": subject_name,
+        "assignment_type": assignment_type_name,
+        "completed": completed
+    })
+
+def content_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def save_feedback(args, file_name, subject_name, assignment_type_name, assignment_text, feedback):
+    """Save the feedback for one file and return where it went"""
+    stem = os.path.splitext(file_name)[0]
+    if args.output == "notes":
+        note = services.export_feedback_note(
+            subject_name, assignment_type_name, assignment_text, feedback,
+            title=f"Feedback: {stem} ({subject_name} - {assignment_type_name})"
+        )
+        return f"note {note['id']}"
+    
+    note = services.build_export_note("Feedback", subject_name, assignment_type_name, "ASSIGNMENT TEXT", assignment_text, "FEEDBACK", feedback)
+    output_path = os.path.join(args.output_dir, f"{stem}.feedback.txt")
+    persistence.atomic_write_text(output_path, note["content"])
+    return output_path
+
+def main():
+    args = parse_args()
+    subject_name, assignment_type_name = resolve_names(args.subject, args.assignment_type)
+    
+    if not os.path.isdir(args.directory):
+        sys.exit(f"Not a folder: {args.directory}")
+    if args.output_dir is None:
+        args.output_dir = os.path.join(args.directory, "feedback")
+    if args.output == "files":
+        os.makedirs(args.output_dir, exist_ok=True)
+    checkpoint_path = args.checkpoint or os.path.join(args.directory, CHECKPOINT_FILE)
+    
+    completed = {} if args.restart else load_checkpoint(checkpoint_path, subject_name, assignment_type_name)
+    
+    # Collect the files that still need feedback
+    pending = []
+    skipped = 0
+    for path in sorted(glob.glob(os.path.join(args.directory, args.pattern))):
+        if not os.path.isfile(path):
+            continue
+        file_name = os.path.basename(path)
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            text = f.read().strip()
+        if not text:
+            print(f"Skipping empty file {file_name}")
+            continue
+        
+        # A file that changed since it was processed gets new feedback
+        entry = completed.get(file_name)
+        if entry and entry.get("hash") == content_hash(text):
+            skipped += 1
+            continue
+        pending.append((file_name, text))
+    
+    total = len(pending)
+    print(f"{total} file(s) to process for {subject_name} - {assignment_type_name}" + (f", {skipped} already done" if skipped else ""))
+    if not total:
+        return
+    
+    # Requests past the concurrency limit wait in the ai_handler scheduler (and rate limiter),
+    # keeping a few more submitted than can run so there is always one ready to start
+    ai_handler.set_max_concurrent_requests(args.concurrency)
+    window = args.concurrency * 2
+    
+    in_flight = {}
+    queued = iter(pending)
+    done_count = 0
+    failed = []
+    start_time = time.perf_counter()
+    
+    def submit_next():
+        for file_name, text in queued:
+            # Batch priority, so anyone using the program at the same time goes first.
+            # Failures are raised, so feedback that happens to start with "Error" isn't mistaken for one.
+            future = services.generate_feedback(subject_name, assignment_type_name, text, priority="batch", source="batch_feedback", raise_errors=True)
+            in_flight[future] = (file_name, text, time.perf_counter())
+            return True
+        return False
+    
+    try:
+        while len(in_flight) < window and submit_next():
+            pass
+        
+        while in_flight:
+            finished, _ = concurrent.futures.wait(in_flight, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in finished:
+                file_name, text, submitted_at = in_flight.pop(future)
+                done_count += 1
+                elapsed = time.perf_counter() - submitted_at
+                
+                try:
+                    feedback = future.result()
+                except Exception as e:
+                    failed.append(file_name)
+                    print(f"[{done_count}/{total}] {file_name}: FAILED ({e.__class__.__name__}: {e})")
+                else:
+                    output = save_feedback(args, file_name, subject_name, assignment_type_name, text, feedback)
+                    completed[file_name] = {"hash": content_hash(text), "output": output}
+                    save_checkpoint(checkpoint_path, subject_name, assignment_type_name, completed)
+                    print(f"[{done_count}/{total}] {file_name}: done in {elapsed:.1f}s -> {output}")
+                
+                submit_next()
+    except KeyboardInterrupt:
+        for future in in_flight:
+            future.cancel()
+        print(f"\nInterrupted after {done_count}/{total} file(s). Run the same command again to continue.")
+        persistence.flush_before_exit()
+        sys.exit(130)
+    
+    # Notes are saved by the background writer
+    persistence.flush_before_exit()
+    
+    wall_time = time.perf_counter() - start_time
+    print(f"\nFinished {total - len(failed)}/{total} file(s) in {wall_time:.1f}s")
+    if failed:
+        print(f"Failed: {', '.join(failed)}. Run the same command again to retry them.")
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark per-request latency of the OpenAI client with and without connection reuse
+
+Starts the local stub chat.completions server and sends the same small request
+through a fresh client per request and through one pooled client built by
+ai_handler.build_http_client. The stub server speaks plain HTTP, so the
+difference shown here is only the TCP connect and client setup cost; against
+the real API every fresh connection also pays for a TLS handshake. Run from
+the repository root:
+
+    python benchmarks/bench_http_reuse.py --requests 200
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+
+from stub_server import start_stub_server
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import openai
+import ai_handler
+
+def send_request(client):
+    start = time.perf_counter()
+    client.chat.completions.create(
+        model="bench-model",
+        messages=[{"role": "user", "content": "Hello!"}],
+        max_completion_tokens=5
+    )
+    return time.perf_counter() - start
+
+def run_fresh_clients(base_url, requests):
+    latencies = []
+    for _ in range(requests):
+        client = openai.OpenAI(api_key="bench", base_url=base_url, max_retries=0)
+        latencies.append(send_request(client))
+        client.close()
+    return latencies
+
+def run_pooled_client(base_url, requests):
+    client = openai.OpenAI(api_key="bench", base_url=base_url, max_retries=0, http_client=ai_handler.build_http_client())
+    latencies = [send_request(client) for _ in range(requests)]
+    client.close()
+    return latencies
+
+def report(name, latencies):
+    latencies = sorted(latencies)
+    p95 = latencies[int(len(latencies) * 0.95) - 1]
+    print(f"{name:<16} mean {statistics.mean(latencies) * 1000:7.2f} ms   "
+          f"p50 {statistics.median(latencies) * 1000:7.2f} ms   p95 {p95 * 1000:7.2f} ms")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200, help="Requests per run")
+    parser.add_argument("--base-url", help="Benchmark against this server instead of the local stub")
+    args = parser.parse_args()
+    
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        server = start_stub_server(latency=0, response_tokens=1)
+        base_url = server.base_url
+    
+    # Warm up both paths once so imports and first-call setup aren't measured
+    run_fresh_clients(base_url, 1)
+    run_pooled_client(base_url, 1)
+    
+    print(f"{args.requests} sequential requests against {base_url}")
+    report("fresh client", run_fresh_clients(base_url, args.requests))
+    report("pooled client", run_pooled_client(base_url, args.requests))
+    
+    if server is not None:
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
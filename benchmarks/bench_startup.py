@@ -0,0 +1,71 @@
+"""
+Measure how long the program's modules take to import before the window can open
+
+Imports the startup chain (main.py imports interface, pages and ai_handler)
+in fresh interpreters with -X importtime, reports the median wall time and
+the slowest modules, and checks whether the OpenAI SDK was imported on the
+way. The SDK should only be loaded on first use or by ai_handler.warm_up()
+once the window is visible. Run from the repository root:
+
+    python benchmarks/bench_startup.py --runs 5
+"""
+import os
+import sys
+import argparse
+import statistics
+import subprocess
+
+REPO_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Heavy packages that should not be on the startup path
+WATCHED_PACKAGES = ["openai", "httpx", "pydantic", "anyio"]
+
+def run_import(module):
+    """Import a module in a fresh interpreter and return its -X importtime lines"""
+    code = f"import {module}; import sys; print('loaded:' + ','.join(p for p in {WATCHED_PACKAGES!r} if p in sys.modules))"
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        cwd=REPO_DIR, capture_output=True, text=True, check=True
+    )
+    
+    # Lines look like "import time: self [us] | cumulative | imported package"
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        timings[name.strip()] = (int(self_us), int(cumulative_us))
+    
+    # Skip anything the imported modules printed themselves
+    loaded = []
+    for line in result.stdout.splitlines():
+        if line.startswith("loaded:"):
+            loaded = [name for name in line[len("loaded:"):].split(",") if name]
+    return timings, loaded
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="interface", help="Module to import (main.py imports interface before opening the window)")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh interpreters to average over")
+    parser.add_argument("--top", type=int, default=10, help="Slowest modules to list")
+    args = parser.parse_args()
+    
+    totals = []
+    for _ in range(args.runs):
+        timings, loaded = run_import(args.module)
+        totals.append(timings[args.module][1])
+    
+    print(f"import {args.module}: median {statistics.median(totals) / 1000:.1f} ms over {args.runs} runs "
+          f"(min {min(totals) / 1000:.1f} ms, max {max(totals) / 1000:.1f} ms)")
+    
+    print("\nSlowest modules by their own import time (last run):")
+    for name, (self_us, _) in sorted(timings.items(), key=lambda item: item[1][0], reverse=True)[:args.top]:
+        print(f"  {self_us / 1000:8.1f} ms  {name}")
+    
+    if loaded:
+        print(f"\nLoaded during startup: {', '.join(loaded)}")
+    else:
+        print(f"\nNone of {', '.join(WATCHED_PACKAGES)} were loaded during startup")
+
+if __name__ == "__main__":
+    main()
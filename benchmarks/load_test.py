@@ -0,0 +1,119 @@
+"""
+Load test for the ai_handler generation path
+
+Drives ai_handler.generate_response (or the streaming path) at a given
+concurrency against the local stub server, or any OpenAI-compatible server,
+and reports latency percentiles, time to first token, throughput and error
+rate. Run from the repository root:
+
+    python benchmarks/load_test.py --requests 200 --concurrency 16
+    python benchmarks/load_test.py --stream --rate-limit-rate 0.1
+"""
+import os
+import sys
+import time
+import argparse
+import statistics
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from stub_server import start_stub_server, add_stub_arguments, stub_config_from_args
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+def percentile(values, fraction):
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    index = min(len(values) - 1, max(0, int(round(fraction * len(values))) - 1))
+    return values[index]
+
+def run_request(ai_handler, index, args):
+    """Send one request and return (latency, time to first token, succeeded)"""
+    first_delta_at = []
+    def on_delta(delta):
+        if not first_delta_at:
+            first_delta_at.append(time.perf_counter())
+    
+    start = time.perf_counter()
+    future = ai_handler.submit_response(
+        topic=f"Load test request {index}",
+        context="Write a short note about load testing.",
+        role="note_taker",
+        max_completion_tokens=args.max_tokens,
+        use_cache=False,
+        on_delta=on_delta if args.stream else None,
+        raise_errors=True
+    )
+    try:
+        future.result()
+        succeeded = True
+    except Exception:
+        succeeded = False
+    end = time.perf_counter()
+    
+    time_to_first_token = (first_delta_at[0] if first_delta_at else end) - start
+    return end - start, time_to_first_token, succeeded
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=100, help="Total requests to send")
+    parser.add_argument("--concurrency", type=int, default=8, help="Requests in flight at the same time")
+    parser.add_argument("--stream", action="store_true", help="Use the streaming path and measure time to first token")
+    parser.add_argument("--max-tokens", type=int, default=200, help="max_completion_tokens per request")
+    parser.add_argument("--base-url", help="Test against this server instead of starting the stub")
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+    
+    server = None
+    base_url = args.base_url
+    if base_url is None:
+        server = start_stub_server(**stub_config_from_args(args))
+        base_url = server.base_url
+    
+    # ai_handler reads its settings at import time
+    os.environ["OPENAI_BASE_URL"] = base_url
+    os.environ.setdefault("OPENAI_API_KEY", "load-test")
+    os.environ.setdefault("OPENAI_MODEL", "stub-model")
+    os.environ.setdefault("AI_MAX_CONCURRENT_REQUESTS", str(args.concurrency))
+    os.environ["USAGE_LEDGER_ENABLED"] = "false"  # Test traffic doesn't belong in the real usage report
+    import ai_handler
+    
+    print(f"{args.requests} requests, concurrency {args.concurrency}, {'streaming' if args.stream else 'non-streaming'}, against {base_url}")
+    
+    completed = []
+    lock = threading.Lock()
+    def worker(index):
+        result = run_request(ai_handler, index, args)
+        with lock:
+            completed.append(result)
+            if len(completed) % max(1, args.requests // 10) == 0:
+                print(f"  {len(completed)}/{args.requests} done")
+        return result
+    
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.concurrency) as executor:
+        results = list(executor.map(worker, range(args.requests)))
+    elapsed = time.perf_counter() - start
+    
+    latencies = [latency for latency, _, ok in results if ok]
+    first_tokens = [ttft for _, ttft, ok in results if ok]
+    errors = sum(1 for _, _, ok in results if not ok)
+    
+    print()
+    print(f"Wall time:    {elapsed:.2f} s")
+    print(f"Throughput:   {len(latencies) / elapsed:.2f} successful requests/s")
+    print(f"Errors:       {errors}/{len(results)} ({errors / len(results) * 100:.1f}%)")
+    if latencies:
+        print(f"Latency:      p50 {percentile(latencies, 0.50) * 1000:.0f} ms   "
+              f"p95 {percentile(latencies, 0.95) * 1000:.0f} ms   p99 {percentile(latencies, 0.99) * 1000:.0f} ms   "
+              f"mean {statistics.mean(latencies) * 1000:.0f} ms")
+    if args.stream and first_tokens:
+        print(f"First token:  p50 {percentile(first_tokens, 0.50) * 1000:.0f} ms   "
+              f"p95 {percentile(first_tokens, 0.95) * 1000:.0f} ms   p99 {percentile(first_tokens, 0.99) * 1000:.0f} ms")
+    if server is not None:
+        print(f"Stub server received {server.request_count} HTTP requests (including retries)")
+        server.shutdown()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,215 @@
+"""
+Local stand-in for the OpenAI chat.completions API
+
+Speaks enough of the wire format for the OpenAI SDK: regular and streamed
+(server-sent events) completions, usage reporting, and configurable latency,
+server errors, 429 rate limits and prompt prefix caching. Used by the benchmarks so the AI path can
+be measured offline and reproducibly.
+
+Run it on its own and point the program at it through the .env file:
+
+    python benchmarks/stub_server.py --port 8100 --latency 0.5
+    OPENAI_BASE_URL=http://127.0.0.1:8100/v1
+"""
+import sys
+import json
+import time
+import hashlib
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+DEFAULT_CONFIG = {
+    "latency": 0.2,          # Seconds before the first token (or the whole response)
+    "token_delay": 0.01,     # Seconds between streamed chunks
+    "response_tokens": 50,   # Words in each response, one per streamed chunk
+    "error_rate": 0.0,       # Fraction of requests answered with a 500
+    "rate_limit_rate": 0.0,  # Fraction of requests answered with a 429
+    "retry_after": 1.0,      # Retry-After sent with 429 responses
+    "rpm": 0,                # Requests per minute before answering 429 (0 = unlimited)
+}
+
+# Prompt caching works like the real API: prompts of at least 1024 tokens can
+# reuse a previously seen prefix, in steps of 128 tokens (about 4 characters each)
+PREFIX_CACHE_MIN_TOKENS = 1024
+PREFIX_CACHE_BLOCK_TOKENS = 128
+
+class StubCompletionsHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # Needed for keep-alive
+    disable_nagle_algorithm = True  # Avoid delayed-ACK stalls on reused connections
+    
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not self.path.rstrip("/").endswith("/chat/completions"):
+            self.send_json(404, {"error": {"message": f"Unknown path {self.path}", "type": "invalid_request_error"}})
+            return
+        
+        request = json.loads(body or b"{}")
+        config = self.server.config
+        self.server.count_request()
+        
+        if self.server.over_rpm_limit() or random.random() < config["rate_limit_rate"]:
+            self.send_json(429, {"error": {"message": "Rate limit reached (stub)", "type": "rate_limit_exceeded"}},
+                           {"Retry-After": str(config["retry_after"])})
+            return
+        if random.random() < config["error_rate"]:
+            self.send_json(500, {"error": {"message": "Internal server error (stub)", "type": "server_error"}})
+            return
+        
+        time.sleep(config["latency"])
+        
+        words = [f"word{i}" for i in range(config["response_tokens"])]
+        prompt = "".join(f"{message.get('role')}:{message.get('content', '')}\n" for message in request.get("messages", []))
+        prompt_tokens = len(prompt) // 4
+        usage = {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": len(words),
+            "total_tokens": prompt_tokens + len(words),
+            "prompt_tokens_details": {"cached_tokens": self.server.cached_prompt_tokens(prompt)}
+        }
+        model = request.get("model", "stub-model")
+        
+        if request.get("stream"):
+            self.stream_completion(model, words, usage, (request.get("stream_options") or {}).get("include_usage"))
+        else:
+            self.send_json(200, {
+                "id": "chatcmpl-stub",
+                "object": "chat.completion",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": " ".join(words)}, "finish_reason": "stop"}],
+                "usage": usage
+            })
+    
+    def stream_completion(self, model, words, usage, include_usage):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Transfer-Encoding", "chunked")
+        self.end_headers()
+        
+        def chunk(choices, usage=None):
+            return {"id": "chatcmpl-stub", "object": "chat.completion.chunk", "created": int(time.time()),
+                    "model": model, "choices": choices, "usage": usage}
+        
+        for i, word in enumerate(words):
+            if i:
+                time.sleep(self.server.config["token_delay"])
+            text = word if i == 0 else " " + word
+            self.send_event(chunk([{"index": 0, "delta": {"content": text}, "finish_reason": None}]))
+        self.send_event(chunk([{"index": 0, "delta": {}, "finish_reason": "stop"}]))
+        if include_usage:
+            self.send_event(chunk([], usage))
+        self.send_chunk(b"data: [DONE]\n\n")
+        self.wfile.write(b"0\r\n\r\n")
+    
+    def send_event(self, data):
+        self.send_chunk(f"data: {json.dumps(data)}\n\n".encode('utf-8'))
+    
+    def send_chunk(self, data):
+        self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+        self.wfile.flush()
+    
+    def send_json(self, status, data, headers=None):
+        body = json.dumps(data).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def log_message(self, format, *args):
+        pass
+
+class StubServer(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 128  # The default backlog of 5 drops bursts of new connections for a second
+    
+    def __init__(self, address, config):
+        super().__init__(address, StubCompletionsHandler)
+        self.config = config
+        self.lock = threading.Lock()
+        self.request_count = 0
+        self.recent_requests = []
+        self.prefix_cache = set()  # Hashes of prompt prefixes seen so far, at block boundaries
+    
+    def count_request(self):
+        with self.lock:
+            self.request_count += 1
+            self.recent_requests.append(time.monotonic())
+    
+    def handle_error(self, request, client_address):
+        # Clients that cancel a request close the connection mid-response
+        if isinstance(sys.exc_info()[1], (BrokenPipeError, ConnectionResetError)):
+            return
+        super().handle_error(request, client_address)
+    
+    def cached_prompt_tokens(self, prompt):
+        """Tokens at the start of the prompt that an earlier request already sent"""
+        block_chars = PREFIX_CACHE_BLOCK_TOKENS * 4
+        prefix_hashes = [hashlib.sha256(prompt[:end].encode('utf-8')).digest()
+                         for end in range(block_chars, len(prompt) + 1, block_chars)]
+        
+        with self.lock:
+            cached_blocks = 0
+            for prefix_hash in prefix_hashes:
+                if prefix_hash not in self.prefix_cache:
+                    break
+                cached_blocks += 1
+            self.prefix_cache.update(prefix_hashes)
+        
+        cached_tokens = cached_blocks * PREFIX_CACHE_BLOCK_TOKENS
+        if len(prompt) // 4 < PREFIX_CACHE_MIN_TOKENS or cached_tokens < PREFIX_CACHE_MIN_TOKENS:
+            return 0
+        return cached_tokens
+    
+    def over_rpm_limit(self):
+        if not self.config["rpm"]:
+            return False
+        with self.lock:
+            cutoff = time.monotonic() - 60
+            self.recent_requests = [t for t in self.recent_requests if t > cutoff]
+            return len(self.recent_requests) > self.config["rpm"]
+    
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+def start_stub_server(port=0, **config):
+    """Start the stub server in a background thread and return it (use server.base_url)"""
+    server = StubServer(("127.0.0.1", port), {**DEFAULT_CONFIG, **config})
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    return server
+
+def add_stub_arguments(parser):
+    """Add the stub server settings as command line options"""
+    parser.add_argument("--latency", type=float, default=DEFAULT_CONFIG["latency"], help="Seconds before the first token")
+    parser.add_argument("--token-delay", type=float, default=DEFAULT_CONFIG["token_delay"], help="Seconds between streamed chunks")
+    parser.add_argument("--response-tokens", type=int, default=DEFAULT_CONFIG["response_tokens"], help="Words per response")
+    parser.add_argument("--error-rate", type=float, default=DEFAULT_CONFIG["error_rate"], help="Fraction of requests failing with 500")
+    parser.add_argument("--rate-limit-rate", type=float, default=DEFAULT_CONFIG["rate_limit_rate"], help="Fraction of requests failing with 429")
+    parser.add_argument("--retry-after", type=float, default=DEFAULT_CONFIG["retry_after"], help="Retry-After seconds sent with 429s")
+    parser.add_argument("--rpm", type=int, default=DEFAULT_CONFIG["rpm"], help="Requests per minute before answering 429 (0 = unlimited)")
+
+def stub_config_from_args(args):
+    return {name: getattr(args, name) for name in DEFAULT_CONFIG}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8100)
+    add_stub_arguments(parser)
+    args = parser.parse_args()
+    
+    server = StubServer(("127.0.0.1", args.port), stub_config_from_args(args))
+    print(f"Stub OpenAI server listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import os
+import json
+import copy
+import threading
+from typing import List, Dict, Optional
+import persistence
+
+WRITE_RETRY_DELAY = 2.0  # Seconds before a failed write (e.g. the file is open in another program) is tried again
+
+class CatalogRegistry:
+    """
+    In-memory copy of a JSON catalog file (a list of records with id, name and description)
+    
+    The parsed records are indexed by name and by id, and the file is only
+    read again when its modification time or size changes. Changes are
+    applied in memory and then written to the file once, atomically and on
+    the background writer thread.
+    """
+    
+    def __init__(self, file_path: str, default_records: List[Dict], label: str):
+        self.file_path = file_path
+        self.default_records = default_records
+        self.label = label  # Used in error messages, e.g. "subjects"
+        self.lock = threading.RLock()
+        self.records = []
+        self.by_name = {}
+        self.by_id = {}
+        self.signature = None  # (mtime, size) of the file when it was last read or written
+        self.writes_pending = 0  # While a write is waiting, memory is newer than the file
+        self.write_failed = False  # Whether the last attempt to write the file failed
+    
+    def get_file_signature(self):
+        try:
+            stat = os.stat(self.file_path)
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+    
+    def ensure_loaded(self):
+        """Read the file if it changed since it was last read"""
+        if self.writes_pending:
+            return
+        
+        signature = self.get_file_signature()
+        if signature is not None and signature == self.signature:
+            return
+        
+        if signature is None:
+            # Create the file with the default records if it doesn't exist
+            self.set_records(copy.deepcopy(self.default_records))
+            self.write()
+            return
+        
+        try:
+            with open(self.file_path, 'r', encoding='utf-8') as f:
+                self.set_records(json.load(f))
+        except Exception as e:
+            print(f"Error loading {self.label}: {e}")
+            self.set_records([])
+        self.signature = signature
+    
+    def set_records(self, records: List[Dict]):
+        self.records = records
+        self.by_name = {record["name"]: record for record in records}
+        self.by_id = {record["id"]: record for record in records}
+    
+    def write(self) -> bool:
+        """
+        Schedule writing the in-memory records to the file
+        
+        Returns False if the file currently can't be written. The change is
+        kept in memory either way and the write is retried until it succeeds.
+        """
+        self.writes_pending += 1
+        persistence.schedule_write(self.file_path, self.write_now)
+        return not self.write_failed
+    
+    def write_now(self):
+        """Write the current records to the file (runs on the background writer thread)"""
+        with self.lock:
+            records = copy.deepcopy(self.records)
+            writes_done = self.writes_pending
+        
+        try:
+            persistence.atomic_write_json(self.file_path, records)
+        except Exception as e:
+            # Keep writes_pending raised so the file isn't re-read over the unsaved change
+            print(f"Error saving {self.label}, retrying in {WRITE_RETRY_DELAY:g}s: {e}")
+            self.write_failed = True
+            persistence.schedule_write(self.file_path, self.write_now, WRITE_RETRY_DELAY)
+            return
+        
+        with self.lock:
+            self.write_failed = False
+            self.writes_pending -= writes_done
+            if not self.writes_pending:
+                # Don't re-read our own write
+                self.signature = self.get_file_signature()
+    
+    def get_all(self) -> List[Dict]:
+        """Get a copy of every record"""
+        with self.lock:
+            self.ensure_loaded()
+            return copy.deepcopy(self.records)
+    
+    def get_names(self) -> List[str]:
+        with self.lock:
+            self.ensure_loaded()
+            return [record["name"] for record in self.records]
+    
+    def get_by_name(self, name: str) -> Optional[Dict]:
+        with self.lock:
+            self.ensure_loaded()
+            record = self.by_name.get(name)
+            return dict(record) if record else None
+    
+    def get_by_id(self, record_id: int) -> Optional[Dict]:
+        with self.lock:
+            self.ensure_loaded()
+            record = self.by_id.get(record_id)
+            return dict(record) if record else None
+    
+    def replace_all(self, records: List[Dict]) -> bool:
+        """Replace every record and write the file"""
+        with self.lock:
+            self.set_records(copy.deepcopy(records))
+            return self.write()
+    
+    def add(self, name: str, description: str) -> bool:
+        """Add a new record, returns False if the name is already taken"""
+        with self.lock:
+            self.ensure_loaded()
+            if name in self.by_name:
+                return False
+            
+            new_id = max(self.by_id, default=0) + 1
+            self.set_records(self.records + [{"id": new_id, "name": name, "description": description}])
+            return self.write()
+    
+    def edit(self, record_id: int, name: str, description: str) -> bool:
+        """Edit an existing record, returns False if it doesn't exist"""
+        with self.lock:
+            self.ensure_loaded()
+            record = self.by_id.get(record_id)
+            if record is None:
+                return False
+            
+            record["name"] = name
+            record["description"] = description
+            self.set_records(self.records)  # Rebuild the name index
+            return self.write()
+    
+    def delete(self, record_id: int) -> bool:
+        """Delete a record, returns False if it doesn't exist"""
+        with self.lock:
+            self.ensure_loaded()
+            if record_id not in self.by_id:
+                return False
+            
+            self.set_records([record for record in self.records if record["id"] != record_id])
+            return self.write()
@@ -1,2 +1,8 @@
+import os
+from pathlib import Path
+
 WINDOW_SIZE = (800, 600)
 PAGES = ['notes', 'feedback', 'starter']
+
+# Directory where all program data is stored
+APP_DIR = os.path.join(str(Path.home()), "Documents", "SAII")
@@ -2,6 +2,13 @@ import tkinter as tk
 from constants import WINDOW_SIZE, PAGES
 from pages import NotesPage, FeedbackPage, StarterPage
 
+PAGE_CLASSES = {'notes': NotesPage, 'feedback': FeedbackPage, 'starter': StarterPage}
+
+# Page instances are created on first visit and kept alive, so switching tabs
+# doesn't rebuild them and AI requests keep running while a page is hidden
+pages = {}
+visible_page = None
+
 def set_current_page(page, current_page_var, content_frame):
     if page in PAGES:
         current_page_var.set(page)
@@ -13,26 +20,40 @@ def set_current_page(page, current_page_var, content_frame):
         notes_button.config(relief='sunken', borderwidth=3, state='disabled')
         feedback_button.config(relief='ridge', borderwidth=2, state='normal')
         starter_button.config(relief='ridge', borderwidth=2, state='normal')
-        show_page(NotesPage, content_frame)
+        show_page('notes', content_frame)
     elif current_page_var.get() == 'feedback':
         notes_button.config(relief='ridge', borderwidth=2, state='normal')
         feedback_button.config(relief='sunken', borderwidth=3, state='disabled')
         starter_button.config(relief='ridge', borderwidth=2, state='normal')
-        show_page(FeedbackPage, content_frame)
+        show_page('feedback', content_frame)
     elif current_page_var.get() == 'starter':
         notes_button.config(relief='ridge', borderwidth=2, state='normal')
         feedback_button.config(relief='ridge', borderwidth=2, state='normal')
         starter_button.config(relief='sunken', borderwidth=3, state='disabled')
-        show_page(StarterPage, content_frame)
+        show_page('starter', content_frame)
 
-def show_page(page_class, content_frame):
-    # Clear the content frame
-    for widget in content_frame.winfo_children():
-        widget.destroy()
+def show_page(page_name, content_frame):
+    global visible_page
+    
+    # Hide the current page
+    if visible_page is not None:
+        visible_page.pack_forget()
+    
+    # Create the page on first visit, otherwise let it pick up changes made elsewhere
+    page = pages.get(page_name)
+    if page is None:
+        page = PAGE_CLASSES[page_name](content_frame)
+        pages[page_name] = page
+    else:
+        page.refresh()
     
-    # Create and show the new page
-    page = page_class(content_frame)
     page.pack(fill=tk.BOTH, expand=True)
+    visible_page = page
+
+def close_pages():
+    """Give every page a chance to save its state before the program closes"""
+    for page in pages.values():
+        page.before_close()
 
 def setup_interface(root, current_page_var):
     # Create a frame to hold the buttons at the top
@@ -63,4 +84,4 @@ def setup_interface(root, current_page_var):
     content_frame.pack(expand=True, fill='both', padx=0, pady=0)
 
     # Show the initial page (Notes)
-    show_page(NotesPage, content_frame)
+    show_page('notes', content_frame)
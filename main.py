@@ -1,7 +1,9 @@
 import tkinter as tk
 from tkinter import messagebox
 from constants import WINDOW_SIZE
-from interface import setup_interface
+from interface import setup_interface, close_pages
+import persistence
+import ai_handler
 import os
 from pathlib import Path
 from dotenv import load_dotenv
@@ -45,6 +47,17 @@ current_page = tk.StringVar(value='notes')
 
 setup_interface(root, current_page)
 
+def on_close():
+    """Save open work and make sure every background save has reached the disk before closing"""
+    close_pages()
+    persistence.flush_before_exit()
+    root.destroy()
+
+root.protocol("WM_DELETE_WINDOW", on_close)
+
+# Load the OpenAI SDK in the background once the window is showing, so the first AI request doesn't wait for it
+root.after(100, ai_handler.warm_up)
+
 # Check API key after GUI is initialized to show the warning message
 root.after(1000, check_api_key)  # Check after 1 second to allow GUI to load first
 
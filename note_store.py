@@ -0,0 +1,341 @@
+import os
+import re
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+from typing import List, Dict, Optional
+from constants import APP_DIR
+import persistence
+
+# Constants
+NOTES_DIR = os.path.join(APP_DIR, "Notes")  # Where notes were stored as one JSON file each
+NOTES_DB = os.path.join(APP_DIR, "notes.sqlite3")
+NOTE_CACHE_SIZE = 32  # Number of recently opened notes kept in memory
+WRITE_RETRY_DELAY = 2.0  # Seconds before a failed write (e.g. database locked by another instance) is tried again
+
+# Ensure the app directory exists
+os.makedirs(APP_DIR, exist_ok=True)
+
+_lock = threading.Lock()
+_connection = None
+_writer_connection = None  # Only used by the background writer, so writes don't hold _lock
+_fts_available = False  # Whether this SQLite build has FTS5, otherwise search falls back to LIKE
+_note_cache = OrderedDict()  # Recently used notes by id, least recently used first
+_version = 0  # Incremented on every change, so views can tell when to reload
+
+# Changes waiting for the background writer: note id -> note to save, or None to delete.
+# Reads look here first, so callers see their changes before they reach the disk.
+_pending = {}
+
+def _get_connection():
+    """Open the notes database on first use, importing old JSON notes once"""
+    global _connection
+    if _connection is None:
+        connection = sqlite3.connect(NOTES_DB, check_same_thread=False)
+        try:
+            # Readers don't wait for the background writer's commits in WAL mode
+            connection.execute("PRAGMA journal_mode=WAL")
+        except sqlite3.OperationalError as e:
+            print(f"Could not switch the notes database to WAL mode: {e}")
+        connection.execute(
+            "CREATE TABLE IF NOT EXISTS notes ("
+            "id INTEGER PRIMARY KEY, "
+            "title TEXT NOT NULL, "
+            "content TEXT NOT NULL, "
+            "size INTEGER NOT NULL DEFAULT 0, "
+            "updated_at REAL NOT NULL DEFAULT 0)"
+        )
+        
+        # Databases created before size and updated_at were tracked
+        columns = {row[1] for row in connection.execute("PRAGMA table_info(notes)")}
+        if "size" not in columns:
+            connection.execute("ALTER TABLE notes ADD COLUMN size INTEGER NOT NULL DEFAULT 0")
+            connection.execute("UPDATE notes SET size = length(CAST(content AS BLOB))")
+        if "updated_at" not in columns:
+            connection.execute("ALTER TABLE notes ADD COLUMN updated_at REAL NOT NULL DEFAULT 0")
+        
+        # Covering index, so listing notes never has to read note content
+        connection.execute("CREATE INDEX IF NOT EXISTS notes_listing ON notes (id, title, size, updated_at)")
+        connection.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        _create_search_index(connection)
+        connection.commit()
+        _connection = connection
+        
+        migrated = connection.execute("SELECT value FROM meta WHERE key = 'json_migrated'").fetchone()
+        if migrated is None:
+            count = _migrate_from_json(connection, NOTES_DIR)
+            connection.execute("INSERT OR REPLACE INTO meta (key, value) VALUES ('json_migrated', '1')")
+            connection.commit()
+            if count:
+                print(f"Migrated {count} notes from {NOTES_DIR}")
+    return _connection
+
+def _create_search_index(connection):
+    """Create the full-text index over note titles and contents, kept up to date by triggers"""
+    global _fts_available
+    exists = connection.execute(
+        "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'notes_fts'"
+    ).fetchone()
+    try:
+        connection.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS notes_fts "
+            "USING fts5(title, content, content='notes', content_rowid='id')"
+        )
+    except sqlite3.OperationalError as e:
+        print(f"Full-text search not available, using slower search: {e}")
+        return
+    
+    connection.executescript("""
+        CREATE TRIGGER IF NOT EXISTS notes_fts_insert AFTER INSERT ON notes BEGIN
+            INSERT INTO notes_fts (rowid, title, content) VALUES (new.id, new.title, new.content);
+        END;
+        CREATE TRIGGER IF NOT EXISTS notes_fts_delete AFTER DELETE ON notes BEGIN
+            INSERT INTO notes_fts (notes_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+        END;
+        CREATE TRIGGER IF NOT EXISTS notes_fts_update AFTER UPDATE OF title, content ON notes BEGIN
+            INSERT INTO notes_fts (notes_fts, rowid, title, content) VALUES ('delete', old.id, old.title, old.content);
+            INSERT INTO notes_fts (rowid, title, content) VALUES (new.id, new.title, new.content);
+        END;
+    """)
+    if not exists:
+        # Index the notes that were saved before the index existed
+        connection.execute("INSERT INTO notes_fts (notes_fts) VALUES ('rebuild')")
+    _fts_available = True
+
+def _migrate_from_json(connection, notes_dir) -> int:
+    """Import every JSON note file in notes_dir whose id isn't in the database yet"""
+    if not os.path.isdir(notes_dir):
+        return 0
+    
+    existing_ids = {row[0] for row in connection.execute("SELECT id FROM notes")}
+    note_files = sorted(f for f in os.listdir(notes_dir) if f.endswith('.json'))
+    
+    imported = []
+    for i, filename in enumerate(note_files):
+        file_path = os.path.join(notes_dir, filename)
+        try:
+            with open(file_path, 'r', encoding='utf-8') as f:
+                note_data = json.load(f)
+            
+            # Ensure the note has the required fields
+            if 'title' not in note_data or 'content' not in note_data:
+                continue
+            
+            note_id = note_data.get('id', i)
+            if note_id in existing_ids:
+                continue
+            existing_ids.add(note_id)
+            content = note_data['content']
+            imported.append((note_id, note_data['title'], content, len(content.encode('utf-8')), os.path.getmtime(file_path)))
+        except Exception as e:
+            print(f"Error migrating note {filename}: {e}")
+    
+    connection.executemany("INSERT INTO notes (id, title, content, size, updated_at) VALUES (?, ?, ?, ?, ?)", imported)
+    connection.commit()
+    return len(imported)
+
+def migrate_from_json(notes_dir: str = NOTES_DIR) -> int:
+    """Import JSON note files into the database and return how many were imported"""
+    with _lock:
+        return _migrate_from_json(_get_connection(), notes_dir)
+
+def list_titles() -> List[Dict]:
+    """Get the id, title, size and last update time of every note, without loading any content"""
+    with _lock:
+        rows = _get_connection().execute(
+            "SELECT id, title, size, updated_at FROM notes INDEXED BY notes_listing ORDER BY id"
+        ).fetchall()
+        notes = {note_id: {"id": note_id, "title": title, "size": size, "updated_at": updated_at}
+                 for note_id, title, size, updated_at in rows}
+        
+        for note_id, note in _pending.items():
+            if note is None:
+                notes.pop(note_id, None)
+            else:
+                notes[note_id] = {key: note[key] for key in ("id", "title", "size", "updated_at")}
+    return sorted(notes.values(), key=lambda note: note["id"])
+
+def get_note(note_id: int) -> Optional[Dict]:
+    """Get a full note by id, or None if it doesn't exist"""
+    with _lock:
+        if note_id in _pending:
+            note = _pending[note_id]
+            return _public_note(note) if note else None
+        
+        if note_id in _note_cache:
+            _note_cache.move_to_end(note_id)
+            return dict(_note_cache[note_id])
+        
+        row = _get_connection().execute(
+            "SELECT id, title, content FROM notes WHERE id = ?", (note_id,)
+        ).fetchone()
+        if row is None:
+            return None
+        
+        note = {"id": row[0], "title": row[1], "content": row[2]}
+        _cache_note(note)
+    return dict(note)
+
+def search_notes(query: str, limit: Optional[int] = 500) -> List[Dict]:
+    """
+    Find notes whose title or content contains every word of the query
+    
+    Words match as prefixes, so results update sensibly while typing.
+    Returns note metadata like list_titles, in the same (id) order. Ranking
+    by relevance is left out on purpose, it makes common prefixes several
+    times slower to search. A limit of None returns every match.
+    """
+    terms = re.findall(r"\w+", query.lower())
+    if not terms:
+        return list_titles()
+    sql_limit = -1 if limit is None else limit  # SQLite treats a negative LIMIT as no limit
+    
+    with _lock:
+        connection = _get_connection()
+        if _fts_available:
+            match = " ".join(f'"{term}"*' for term in terms)
+            rows = connection.execute(
+                "SELECT notes.id, notes.title, notes.size, notes.updated_at FROM notes_fts "
+                "JOIN notes ON notes.id = notes_fts.rowid "
+                "WHERE notes_fts MATCH ? ORDER BY notes_fts.rowid LIMIT ?",
+                (match, sql_limit)
+            ).fetchall()
+        else:
+            conditions = " AND ".join("(title LIKE ? OR content LIKE ?)" for _ in terms)
+            parameters = [value for term in terms for value in (f"%{term}%", f"%{term}%")]
+            rows = connection.execute(
+                f"SELECT id, title, size, updated_at FROM notes WHERE {conditions} ORDER BY id LIMIT ?",
+                parameters + [sql_limit]
+            ).fetchall()
+        
+        results = [{"id": note_id, "title": title, "size": size, "updated_at": updated_at}
+                   for note_id, title, size, updated_at in rows if note_id not in _pending]
+        
+        # Changes that haven't been written yet aren't in the index
+        for note_id, note in _pending.items():
+            if note is None:
+                continue
+            text = f"{note['title']}\n{note['content']}".lower()
+            if all(term in text for term in terms):
+                results.append({key: note[key] for key in ("id", "title", "size", "updated_at")})
+    results.sort(key=lambda note: note["id"])
+    return results if limit is None else results[:limit]
+
+def _public_note(note: Dict) -> Dict:
+    return {"id": note["id"], "title": note["title"], "content": note["content"]}
+
+def _cache_note(note: Dict):
+    _note_cache[note["id"]] = _public_note(note)
+    _note_cache.move_to_end(note["id"])
+    while len(_note_cache) > NOTE_CACHE_SIZE:
+        _note_cache.popitem(last=False)
+
+def save_note(note: Dict):
+    """Insert or update a note, returning immediately while the write happens in the background"""
+    pending_note = _public_note(note)
+    pending_note["size"] = len(note["content"].encode('utf-8'))
+    pending_note["updated_at"] = time.time()
+    
+    with _lock:
+        _pending[note["id"]] = pending_note
+        _cache_note(note)
+        _bump_version()
+    _schedule_write(note["id"])
+
+def delete_note(note_id: int):
+    """Delete a note by id, returning immediately while the write happens in the background"""
+    with _lock:
+        _pending[note_id] = None
+        _note_cache.pop(note_id, None)
+        _bump_version()
+    _schedule_write(note_id)
+
+def _schedule_write(note_id: int, delay: float = None):
+    persistence.schedule_write(f"note:{note_id}", lambda: _write_pending(note_id), delay)
+
+def _get_writer_connection():
+    """Open the background writer's own connection to the notes database on first use"""
+    global _writer_connection
+    if _writer_connection is None:
+        with _lock:
+            _get_connection()  # Creates the tables and imports old notes
+        _writer_connection = sqlite3.connect(NOTES_DB, check_same_thread=False)
+    return _writer_connection
+
+def _write_pending(note_id: int):
+    """
+    Write the latest pending change of a note to the database (runs on the background writer thread)
+    
+    The lock is only held to take the change from _pending, so the UI thread
+    never waits for the disk. A failed write stays pending and is tried again.
+    """
+    with _lock:
+        if note_id not in _pending:
+            return
+        note = _pending[note_id]
+    
+    try:
+        connection = _get_writer_connection()
+        if note is None:
+            connection.execute("DELETE FROM notes WHERE id = ?", (note_id,))
+        else:
+            # An upsert (unlike INSERT OR REPLACE) fires the update trigger of the search index
+            connection.execute(
+                "INSERT INTO notes (id, title, content, size, updated_at) VALUES (?, ?, ?, ?, ?) "
+                "ON CONFLICT (id) DO UPDATE SET title = excluded.title, content = excluded.content, "
+                "size = excluded.size, updated_at = excluded.updated_at",
+                (note["id"], note["title"], note["content"], note["size"], note["updated_at"])
+            )
+        connection.commit()
+    except sqlite3.Error as e:
+        if _writer_connection is not None:
+            _writer_connection.rollback()
+        print(f"Error saving note {note_id}, retrying in {WRITE_RETRY_DELAY:g}s: {e}")
+        _schedule_write(note_id, WRITE_RETRY_DELAY)
+        return
+    
+    with _lock:
+        # A change made while this one was being written stays pending for its own write
+        if note_id in _pending and _pending[note_id] is note:
+            del _pending[note_id]
+
+def _bump_version():
+    global _version
+    _version += 1
+
+def get_version() -> int:
+    """Get a number that changes whenever a note is saved or deleted"""
+    return _version
+
+def allocate_note_id() -> int:
+    """
+    Reserve a new, unique note id
+    
+    The next id is a counter stored in the database and incremented inside
+    an IMMEDIATE transaction, which holds SQLite's write lock. No two callers,
+    even in different instances of the program sharing the same Documents
+    folder, can get the same id, and allocating one is constant time.
+    """
+    with _lock:
+        connection = _get_connection()
+        connection.commit()  # Make sure no implicit transaction is open
+        connection.execute("BEGIN IMMEDIATE")
+        try:
+            row = connection.execute("SELECT value FROM meta WHERE key = 'next_note_id'").fetchone()
+            if row is None:
+                # First allocation, continue after the highest existing id
+                max_id = connection.execute("SELECT COALESCE(MAX(id), -1) FROM notes").fetchone()[0]
+                note_id = max([max_id] + list(_pending)) + 1
+            else:
+                note_id = int(row[0])
+            
+            connection.execute(
+                "INSERT OR REPLACE INTO meta (key, value) VALUES ('next_note_id', ?)", (str(note_id + 1),)
+            )
+            connection.commit()
+        except BaseException:
+            connection.rollback()
+            raise
+    return note_id
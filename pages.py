@@ -2,17 +2,12 @@ import tkinter as tk
 from tkinter import ttk, simpledialog, filedialog, messagebox
 import ai_handler
 import threading
-import os
-import json
-from pathlib import Path
+import queue
+import time
 import subjects  # Import the subjects module
 import assignment_types  # Import the assignment types module
-
-# Constants
-NOTES_DIR = os.path.join(str(Path.home()), "Documents", "SAII", "Notes")
-
-# Ensure the notes directory exists
-os.makedirs(NOTES_DIR, exist_ok=True)
+import note_store  # Import the note storage module
+import services  # AI tasks shared with the command line tools
 
 class APICheckWindow(tk.Toplevel):
     def __init__(self, parent, on_complete):
@@ -66,6 +61,14 @@ class APICheckWindow(tk.Toplevel):
         self.destroy()
         self.on_complete(api_connected)
 
+def check_api_connection(parent, on_complete):
+    """Call on_complete with the API connection state, showing APICheckWindow only when no fresh state is cached"""
+    api_connected = ai_handler.get_cached_api_health()
+    if api_connected is None:
+        APICheckWindow(parent, on_complete)
+    else:
+        on_complete(api_connected)
+
 class AIPromptWindow(tk.Toplevel):
     def __init__(self, parent, callback):
         super().__init__(parent)
@@ -137,14 +140,307 @@ class AIPromptWindow(tk.Toplevel):
         self.callback(topic, context)
         self.destroy()
 
-class NotesPage(tk.Frame):
+def describe_queue_position(position, eta):
+    """Readable wait status of a queued AI request, or None once it has started"""
+    if position is None:
+        return None
+    
+    if position == 0:
+        ahead = "next in line"
+    elif position == 1:
+        ahead = "1 request ahead"
+    else:
+        ahead = f"{position} requests ahead"
+    
+    if eta is None:
+        return f"Waiting for the AI: {ahead}..."
+    if eta < 60:
+        return f"Waiting for the AI: {ahead}, about {max(1, int(eta))} s..."
+    return f"Waiting for the AI: {ahead}, about {round(eta / 60)} min..."
+
+class ChunkedTextInserter:
+    """Inserts a large string into a Text widget in slices, yielding to the event loop between them"""
+    
+    CHUNK_SIZE = 16384  # Characters per insert call
+    FRAME_BUDGET = 0.012  # Seconds of inserting before handing control back to Tk
+    
+    def __init__(self, text_widget, index, text, on_done=None):
+        self.text_widget = text_widget
+        self.text = text
+        self.position = 0
+        self.on_done = on_done
+        self.job = None
+        
+        # Right gravity keeps the mark after each inserted slice
+        self.mark = f"chunked_insert_{id(self)}"
+        self.text_widget.mark_set(self.mark, index)
+        self.text_widget.mark_gravity(self.mark, 'right')
+    
+    def start(self):
+        """Insert the first slices right away and schedule the rest"""
+        self.step()
+    
+    def running(self):
+        return self.mark is not None
+    
+    def cancel(self):
+        """Stop inserting, leaving whatever was inserted so far"""
+        if self.job is not None:
+            try:
+                self.text_widget.after_cancel(self.job)
+            except tk.TclError:
+                pass
+            self.job = None
+        self.finish()
+    
+    def step(self):
+        self.job = None
+        deadline = time.perf_counter() + self.FRAME_BUDGET
+        try:
+            previous_state = self.text_widget.cget('state')
+            self.text_widget.config(state='normal')
+            while self.position < len(self.text) and time.perf_counter() < deadline:
+                end = self.position + self.CHUNK_SIZE
+                self.text_widget.insert(self.mark, self.text[self.position:end])
+                self.position = end
+            self.text_widget.config(state=previous_state)
+        except tk.TclError:
+            # The widget was destroyed mid-load
+            self.mark = None
+            return
+        
+        if self.position < len(self.text):
+            # Idle callbacks added from an idle callback wait for the next idle pass,
+            # so pending input and redraws are handled between slices
+            self.job = self.text_widget.after_idle(self.step)
+            return
+        
+        self.finish()
+        if self.on_done:
+            self.on_done()
+    
+    def finish(self):
+        if self.mark is None:
+            return
+        try:
+            self.text_widget.mark_unset(self.mark)
+        except tk.TclError:
+            pass
+        self.mark = None
+
+class TextStreamWriter:
+    """Appends streamed AI text to a Text widget in batches at a bounded frame rate"""
+    
+    FRAME_INTERVAL_MS = 50  # At most one widget update per frame (~20 fps)
+    MAX_CHARS_PER_FRAME = ChunkedTextInserter.CHUNK_SIZE  # Large batches (e.g. cached responses) are spread over frames
+    
+    def __init__(self, text_widget, start_index, on_done=None, on_error=None):
+        self.text_widget = text_widget
+        self.on_done = on_done
+        self.on_error = on_error
+        self.future = None
+        self.deltas = queue.Queue()  # Filled from the event loop thread, drained on the Tk thread
+        self.chunks = []
+        self.backlog = ""  # Received text that didn't fit in the previous frames
+        self.backlog_position = 0
+        self.status = None  # Progress message shown in place of the placeholder
+        self.shown_status = None
+        self.finished = False
+        
+        # Everything between the two marks is the placeholder, replaced by the first chunk.
+        # The end mark has right gravity so it moves along as text is inserted at it.
+        self.start_mark = f"stream_start_{id(self)}"
+        self.end_mark = f"stream_end_{id(self)}"
+        self.text_widget.mark_set(self.start_mark, start_index)
+        self.text_widget.mark_gravity(self.start_mark, 'left')
+        self.text_widget.mark_set(self.end_mark, 'end-1c')
+        self.text_widget.mark_gravity(self.end_mark, 'right')
+    
+    def feed(self, delta):
+        """Queue a text delta (safe to call from any thread)"""
+        self.deltas.put(delta)
+    
+    def set_status(self, text):
+        """Show a progress message in place of the placeholder until the response starts (safe to call from any thread)"""
+        self.status = text
+    
+    def track(self, future):
+        """Start polling the request future, rendering deltas until it is done"""
+        self.future = future
+        self.text_widget.after(self.FRAME_INTERVAL_MS, self.flush)
+    
+    def running(self):
+        return not self.finished
+    
+    def stop(self, message=""):
+        """
+        Cancel the request and render everything received so far right away
+        
+        Used before the widget's text is saved and the widget closed. The
+        placeholder is removed, and message is added after the text if the
+        response was cut short. A response that already completed is finished
+        with on_done as usual.
+        """
+        if self.finished:
+            return
+        self.finished = True
+        completed = self.future.done() and not self.future.cancelled() and self.future.exception() is None
+        self.future.cancel()
+        
+        rest = self.backlog[self.backlog_position:]
+        while True:
+            try:
+                rest += self.deltas.get_nowait()
+            except queue.Empty:
+                break
+        
+        try:
+            if rest:
+                self.write(rest)
+            if not self.chunks:
+                self.replace_placeholder("")
+            elif not completed and message:
+                self.insert(message)
+            self.text_widget.mark_unset(self.start_mark, self.end_mark)
+        except tk.TclError:
+            return  # The widget is already gone
+        
+        if completed and self.on_done:
+            self.on_done("".join(self.chunks))
+    
+    def flush(self):
+        """Insert everything that arrived since the last frame as one coalesced chunk"""
+        if self.finished:
+            return  # Stopped early
+        
+        # Check for completion first: once the future is done every delta has been queued
+        done = self.future.done()
+        batch = []
+        while True:
+            try:
+                batch.append(self.deltas.get_nowait())
+            except queue.Empty:
+                break
+        if batch:
+            self.backlog = self.backlog[self.backlog_position:] + "".join(batch)
+            self.backlog_position = 0
+        
+        try:
+            if not self.chunks and self.status != self.shown_status:
+                self.shown_status = self.status
+                self.replace_placeholder(self.status)
+            
+            if self.backlog_position < len(self.backlog):
+                end = self.backlog_position + self.MAX_CHARS_PER_FRAME
+                self.write(self.backlog[self.backlog_position:end])
+                self.backlog_position = end
+            
+            if self.backlog_position < len(self.backlog):
+                # Keep inserting the rest as soon as pending events are handled
+                self.text_widget.after_idle(self.flush)
+                return
+            
+            if not done:
+                self.text_widget.after(self.FRAME_INTERVAL_MS, self.flush)
+                return
+            
+            self.finished = True
+            if self.future.cancelled():
+                return
+            
+            if not self.chunks:
+                # Nothing arrived, so the placeholder still has to go
+                self.replace_placeholder("")
+            self.text_widget.mark_unset(self.start_mark, self.end_mark)
+            
+            error = self.future.exception()
+            if error is not None:
+                if self.on_error:
+                    self.on_error(f"An error occurred: {str(error)}")
+            elif self.on_done:
+                self.on_done("".join(self.chunks))
+        except tk.TclError:
+            # The widget was destroyed while the response was streaming in
+            pass
+    
+    def write(self, text):
+        if not self.chunks:
+            # Skip leading whitespace so the response starts right at the mark
+            text = text.lstrip()
+            if not text:
+                return
+            self.replace_placeholder(text)
+        else:
+            self.insert(text)
+        self.chunks.append(text)
+        self.text_widget.see(self.end_mark)
+    
+    def replace_placeholder(self, text):
+        previous_state = self.text_widget.cget('state')
+        self.text_widget.config(state='normal')
+        self.text_widget.delete(self.start_mark, self.end_mark)
+        self.text_widget.insert(self.end_mark, text)
+        self.text_widget.config(state=previous_state)
+    
+    def insert(self, text):
+        previous_state = self.text_widget.cget('state')
+        self.text_widget.config(state='normal')
+        self.text_widget.insert(self.end_mark, text)
+        self.text_widget.config(state=previous_state)
+
+class AIPage(tk.Frame):
+    """Base class for pages that send requests to the AI, cancelling them when the page is destroyed"""
+    
     def __init__(self, parent):
         super().__init__(parent)
-        self.notes = []  # List to store notes
+        self.pending_requests = set()
+        self.bind('<Destroy>', self.on_destroy)
+    
+    def refresh(self):
+        """Called when the page is shown again after being hidden"""
+        pass
+    
+    def before_close(self):
+        """Called before the program closes"""
+        pass
+    
+    def track_request(self, future):
+        """Keep track of an in-flight request so it can be cancelled"""
+        self.pending_requests.add(future)
+        future.add_done_callback(self.pending_requests.discard)
+    
+    def on_destroy(self, event):
+        if event.widget is not self:
+            return
+        for future in list(self.pending_requests):
+            future.cancel()
+
+class NotesPage(AIPage):
+    AUTOSAVE_DELAY_MS = 1500  # Save once typing has paused for this long
+    
+    def __init__(self, parent):
+        super().__init__(parent)
+        self.notes = {}  # Metadata of every note by id, content is loaded when a note is opened
         self.current_note = None
+        self.autosave_job = None  # Pending after() id of the debounced autosave
+        self.dirty = False  # Whether the editor has edits that aren't saved yet
+        self.note_loader = None  # ChunkedTextInserter filling the editor with the open note
+        self.note_writers = []  # TextStreamWriters of AI responses streaming into the open note
+        self.loaded_version = None  # Note store version the sidebar was built from
         self.setup_ui()
         self.load_notes()
 
+    def before_close(self):
+        """Save unsaved edits before the program closes"""
+        self.autosave()
+
+    def refresh(self):
+        """Reload the sidebar if notes were changed elsewhere (e.g. exported) while the page was hidden"""
+        if note_store.get_version() != self.loaded_version:
+            self.load_notes()
+            if self.current_note and self.notes_list.exists(str(self.current_note["id"])):
+                self.notes_list.selection_set(str(self.current_note["id"]))
+
     def setup_ui(self):
         # Create the left frame (side menu) with fixed width
         self.side_menu = tk.Frame(self, relief='solid', borderwidth=1)
@@ -157,13 +453,36 @@ class NotesPage(tk.Frame):
                               command=self.create_new_note)
         new_button.grid(row=1, column=0, padx=0, pady=0, sticky='ew')
         
-        # Frame to hold the list of notes
+        # Search box, filtering the list below as you type
+        search_frame = tk.Frame(self.side_menu)
+        search_frame.grid(row=2, column=0, padx=0, pady=5, sticky='ew')
+        
+        search_label = tk.Label(search_frame, text="Search:")
+        search_label.pack(side='left', padx=(5, 0))
+        
+        self.search_var = tk.StringVar()
+        self.search_var.trace_add('write', lambda *args: self.apply_search())
+        search_entry = ttk.Entry(search_frame, textvariable=self.search_var)
+        search_entry.pack(side='left', fill='x', expand=True, padx=5)
+        
+        # Frame to hold the list of notes. A Treeview only draws the visible rows,
+        # so it stays fast with thousands of notes, and rows are addressed by note id.
         self.notes_list_frame = tk.Frame(self.side_menu)
-        self.notes_list_frame.grid(row=2, column=0, padx=0, pady=0, sticky='nsew')
+        self.notes_list_frame.grid(row=3, column=0, padx=0, pady=0, sticky='nsew')
+        
+        self.notes_list = ttk.Treeview(self.notes_list_frame, show='tree', selectmode='browse')
+        self.notes_list.column('#0', width=200)
+        self.notes_list.pack(side='left', fill='both', expand=True)
+        
+        notes_scrollbar = ttk.Scrollbar(self.notes_list_frame, orient='vertical', command=self.notes_list.yview)
+        notes_scrollbar.pack(side='right', fill='y')
+        self.notes_list.config(yscrollcommand=notes_scrollbar.set)
+        
+        self.notes_list.bind('<<TreeviewSelect>>', self.on_note_select)
         
         # Configure side menu column weights
         self.side_menu.grid_columnconfigure(0, weight=1)
-        self.side_menu.grid_rowconfigure(2, weight=1)  # Make the notes list expandable
+        self.side_menu.grid_rowconfigure(3, weight=1)  # Make the notes list expandable
         
         # Create the right frame (workspace) that fills all remaining space
         self.workspace = tk.Frame(self, relief='solid', borderwidth=1)
@@ -173,78 +492,61 @@ class NotesPage(tk.Frame):
         self.show_empty_workspace()
     
     def load_notes(self):
-        """Load notes from the SAII/Notes directory"""
+        """Load the note titles from the note store"""
         try:
-            # Clear existing notes
-            self.notes = []
-            
             # Clear notes list in sidebar
-            for widget in self.notes_list_frame.winfo_children():
-                widget.destroy()
+            self.notes_list.delete(*self.notes_list.get_children())
+            
+            self.loaded_version = note_store.get_version()
+            self.notes = {note['id']: note for note in note_store.list_titles()}
             
-            # Get all .json files in the notes directory
-            note_files = [f for f in os.listdir(NOTES_DIR) if f.endswith('.json')]
+            # Add each note to the sidebar
+            for note in self.notes.values():
+                self.notes_list.insert('', 'end', iid=str(note['id']), text=note['title'])
             
-            # Load each note
-            for i, filename in enumerate(note_files):
-                file_path = os.path.join(NOTES_DIR, filename)
-                try:
-                    with open(file_path, 'r', encoding='utf-8') as f:
-                        note_data = json.load(f)
-                        
-                    # Ensure the note has the required fields
-                    if 'title' not in note_data or 'content' not in note_data:
-                        continue
-                    
-                    # Add ID if not present
-                    if 'id' not in note_data:
-                        note_data['id'] = i
-                    
-                    # Add the note to our list
-                    self.notes.append(note_data)
-                    
-                    # Add note to the sidebar
-                    note_button = tk.Button(self.notes_list_frame, text=note_data['title'], relief='flat', anchor='w',
-                                          command=lambda id=note_data['id']: self.open_note(id))
-                    note_button.pack(fill='x', padx=0, pady=0)
-                    
-                except Exception as e:
-                    print(f"Error loading note {filename}: {e}")
+            if self.search_var.get().strip():
+                self.apply_search()
             
             print(f"Loaded {len(self.notes)} notes")
             
         except Exception as e:
             print(f"Error loading notes: {e}")
     
+    def apply_search(self):
+        """Show only the notes matching the search box, or every note if it's empty"""
+        query = self.search_var.get().strip()
+        if query:
+            # Every match, so notes past the first few hundred can still be found
+            matches = note_store.search_notes(query, limit=None)
+            note_ids = [str(note['id']) for note in matches if note['id'] in self.notes]
+        else:
+            note_ids = [str(note_id) for note_id in self.notes]
+        
+        # Rows that don't match are detached rather than deleted, so clearing the search is cheap
+        self.notes_list.set_children('', *note_ids)
+    
     def save_note_to_disk(self, note):
-        """Save a note to disk"""
+        """Save a note to the note store"""
         if not note:
             return
-            
-        # Create a safe filename based on the note ID
-        filename = f"note_{note['id']}.json"
-        file_path = os.path.join(NOTES_DIR, filename)
         
         try:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(note, f, ensure_ascii=False, indent=2)
-            print(f"Saved note to {file_path}")
+            note_store.save_note(note)
+            self.loaded_version = note_store.get_version()  # The sidebar already reflects this change
+            print(f"Saved note {note['id']}")
         except Exception as e:
             print(f"Error saving note: {e}")
             messagebox.showerror("Save Error", f"Could not save note: {e}")
     
     def delete_note_from_disk(self, note_id):
-        """Delete a note file from disk"""
-        filename = f"note_{note_id}.json"
-        file_path = os.path.join(NOTES_DIR, filename)
-        
+        """Delete a note from the note store"""
         try:
-            if os.path.exists(file_path):
-                os.remove(file_path)
-                print(f"Deleted note file: {file_path}")
+            note_store.delete_note(note_id)
+            self.loaded_version = note_store.get_version()  # The sidebar already reflects this change
+            print(f"Deleted note {note_id}")
         except Exception as e:
-            print(f"Error deleting note file: {e}")
-            messagebox.showerror("Delete Error", f"Could not delete note file: {e}")
+            print(f"Error deleting note: {e}")
+            messagebox.showerror("Delete Error", f"Could not delete note: {e}")
     
     def show_empty_workspace(self):
         # Clear workspace
@@ -260,25 +562,45 @@ class NotesPage(tk.Frame):
         # Prompt user for note title
         title = simpledialog.askstring("New Note", "Enter note title:")
         if title:
+            # Show the whole list again so the new note is visible
+            self.search_var.set('')
+            
             # Create a new note
-            note_id = max([note['id'] for note in self.notes], default=-1) + 1
+            note_id = note_store.allocate_note_id()
             new_note = {"id": note_id, "title": title, "content": ""}
-            self.notes.append(new_note)
+            self.notes[note_id] = {"id": note_id, "title": title}
             
             # Add note to the sidebar
-            note_button = tk.Button(self.notes_list_frame, text=title, relief='flat', anchor='w',
-                                  command=lambda id=note_id: self.open_note(id))
-            note_button.pack(fill='x', padx=0, pady=0)
+            self.notes_list.insert('', 'end', iid=str(note_id), text=title)
             
             # Save to disk
             self.save_note_to_disk(new_note)
             
             # Open the new note
             self.open_note(note_id)
+            self.notes_list.selection_set(str(note_id))
+            self.notes_list.see(str(note_id))
+    
+    def on_note_select(self, event):
+        """Open the note selected in the sidebar"""
+        selection = self.notes_list.selection()
+        if not selection:
+            return
+        
+        note_id = int(selection[0])
+        if self.current_note and self.current_note["id"] == note_id:
+            return  # Already open
+        self.open_note(note_id)
     
     def open_note(self, note_id):
+        # Save unsaved edits to the note being closed and stop loading it if it's still coming in.
+        # AI responses still streaming into it are cancelled, keeping the text that already arrived.
+        self.stop_note_requests()
+        self.autosave()
+        self.cancel_note_load()
+        
         # Get the note data
-        self.current_note = next((note for note in self.notes if note["id"] == note_id), None)
+        self.current_note = note_store.get_note(note_id)
         if not self.current_note:
             return
         
@@ -308,8 +630,11 @@ class NotesPage(tk.Frame):
         self.text_area = tk.Text(self.workspace, wrap='word')
         self.text_area.pack(fill='both', expand=True, padx=10, pady=5)
         
-        # Set current content
-        self.text_area.insert('1.0', self.current_note["content"])
+        # Fill in the content in slices so large notes don't freeze the window,
+        # read-only until it is complete so a partial note can't be edited or saved
+        self.text_area.config(state='disabled')
+        self.note_loader = ChunkedTextInserter(self.text_area, '1.0', self.current_note["content"], on_done=self.on_note_loaded)
+        self.note_loader.start()
         
         # Button bar
         button_frame = tk.Frame(self.workspace)
@@ -321,9 +646,34 @@ class NotesPage(tk.Frame):
         ai_button = tk.Button(button_frame, text="Generate Notes with AI", command=self.ask_ai)
         ai_button.pack(side='left', padx=5)
     
+    def on_note_loaded(self):
+        """Make the editor usable once the whole note has been inserted"""
+        self.note_loader = None
+        self.text_area.config(state='normal')
+        self.text_area.mark_set(tk.INSERT, '1.0')
+        
+        # Autosave after edits, starting from an unmodified state
+        self.dirty = False
+        self.text_area.edit_modified(False)
+        self.text_area.bind('<<Modified>>', self.on_text_modified)
+    
+    def note_loading(self):
+        return self.note_loader is not None and self.note_loader.running()
+    
+    def cancel_note_load(self):
+        if self.note_loader is not None:
+            self.note_loader.cancel()
+            self.note_loader = None
+    
+    def stop_note_requests(self):
+        """Cancel the AI requests streaming into the open note, which is about to be closed"""
+        for writer in self.note_writers:
+            writer.stop("\n[AI response stopped: the note was closed]\n\n")
+        self.note_writers = []
+    
     def rename_current_note(self):
         """Rename the current note"""
-        if not self.current_note:
+        if not self.current_note or self.note_loading():
             return
             
         # Prompt for new title
@@ -332,14 +682,14 @@ class NotesPage(tk.Frame):
             return  # User cancelled or entered empty string
             
         # Update note title
-        old_title = self.current_note["title"]
+        note_id = self.current_note["id"]
         self.current_note["title"] = new_title
+        if note_id in self.notes:
+            self.notes[note_id]["title"] = new_title
         
         # Update UI
-        for widget in self.notes_list_frame.winfo_children():
-            if isinstance(widget, tk.Button) and widget.cget("text") == old_title:
-                widget.config(text=new_title)
-                break
+        if self.notes_list.exists(str(note_id)):
+            self.notes_list.item(str(note_id), text=new_title)
         
         # Update title in the workspace
         for widget in self.workspace.winfo_children()[0].winfo_children():
@@ -360,41 +710,90 @@ class NotesPage(tk.Frame):
         if not confirm:
             return
             
+        # Don't autosave, keep loading or keep generating text for a note that is being deleted
+        self.stop_note_requests()
+        self.cancel_autosave()
+        self.dirty = False
+        self.cancel_note_load()
+        
         # Remove the note from the list
         note_id = self.current_note["id"]
-        note_title = self.current_note["title"]
-        self.notes = [note for note in self.notes if note["id"] != note_id]
+        self.notes.pop(note_id, None)
         
         # Remove the note from disk
         self.delete_note_from_disk(note_id)
         
-        # Remove the note button from sidebar
-        for widget in self.notes_list_frame.winfo_children():
-            if isinstance(widget, tk.Button) and widget.cget("text") == note_title:
-                widget.destroy()
-                break
+        # Remove the note from sidebar
+        if self.notes_list.exists(str(note_id)):
+            self.notes_list.delete(str(note_id))
         
         # Show empty workspace
         self.current_note = None
         self.show_empty_workspace()
     
     def save_current_note(self):
-        if self.current_note:
+        if self.current_note and not self.note_loading():
+            self.cancel_autosave()
+            
             # Update note content
             self.current_note["content"] = self.text_area.get('1.0', 'end-1c')
+            self.dirty = False
             
             # Save to disk
             self.save_note_to_disk(self.current_note)
             
             print(f"Saved note: {self.current_note['title']}")
     
+    def on_text_modified(self, event):
+        """Schedule an autosave, restarting the wait on every edit"""
+        # The event also fires when the modified flag is reset
+        if not self.text_area.edit_modified():
+            return
+        
+        # Tk only fires <<Modified>> when the flag changes, so reset it right away
+        # to hear about the next edit too, and remember the edit ourselves
+        self.dirty = True
+        self.text_area.edit_modified(False)
+        
+        self.cancel_autosave()
+        self.autosave_job = self.after(self.AUTOSAVE_DELAY_MS, self.autosave)
+    
+    def cancel_autosave(self):
+        if self.autosave_job is not None:
+            self.after_cancel(self.autosave_job)
+            self.autosave_job = None
+    
+    def autosave(self):
+        """Save the current note if it has unsaved changes"""
+        self.cancel_autosave()
+        if not self.current_note or self.note_loading():
+            return
+        
+        try:
+            # Tk delivers <<Modified>> later, so an edit made just before this call
+            # (e.g. by a stopped AI response) is only visible in the widget's flag
+            if not self.dirty and not self.text_area.edit_modified():
+                return
+            content = self.text_area.get('1.0', 'end-1c')
+            self.text_area.edit_modified(False)
+        except tk.TclError:
+            return  # The editor is already gone
+        self.dirty = False
+        
+        # Typing and undoing back to the saved text doesn't need a write
+        if content == self.current_note["content"]:
+            return
+        
+        self.current_note["content"] = content
+        self.save_note_to_disk(self.current_note)
+    
     def ask_ai(self):
         """Check for API connection and then open the AI prompt window"""
-        if not self.current_note:
+        if not self.current_note or self.note_loading():
             return
         
-        # Create a waiting window to check the API connection
-        APICheckWindow(self, self.on_api_check_complete)
+        # Check the API connection, only waiting on a request if the cached state is stale
+        check_api_connection(self, self.on_api_check_complete)
     
     def on_api_check_complete(self, api_connected):
         """Callback for when the API connection check is complete"""
@@ -426,66 +825,42 @@ class NotesPage(tk.Frame):
             else:
                 self.text_area.insert('end', '\n\n')  # Add two newlines for spacing
         
-        # Add the processing message
-        self.text_area.insert('end', "[Processing AI request...]\n")
-        response_start_mark = self.text_area.index('end-1l linestart')
+        # Add the processing message, which shows the queue position while the
+        # request waits and is replaced by the response once it starts arriving
+        response_start_mark = self.text_area.index('end-1c')
+        self.text_area.insert('end', "[Processing AI request...]")
         self.text_area.see('end')
-        self.update_idletasks()  # Update the UI to show the processing message
         
-        # Create a progress indicator
-        progress_frame = tk.Frame(self.text_area)
-        progress = ttk.Progressbar(progress_frame, orient="horizontal", length=200, mode="indeterminate")
-        progress.pack(pady=5)
-        
-        # Create a window for the progress bar
-        progress_window = self.text_area.window_create('end', window=progress_frame)
-        progress.start(10)
-        self.update_idletasks()
-        
-        # Create a function to process the AI request in the background
-        def process_in_background():
-            try:
-                # Call the AI handler to get a response with the note_taker role
-                response = ai_handler.generate_response(
-                    topic=topic, 
-                    context=context,
-                    role="note_taker"  # Use the note_taker role for the Notes page
-                )
-                
-                # Schedule the UI update on the main thread
-                self.after(0, lambda: self.update_with_response(response, progress_frame, response_start_mark))
-                
-            except Exception as e:
-                error_msg = f"An error occurred: {str(e)}"
-                self.after(0, lambda: self.update_with_error(error_msg, progress_frame, response_start_mark))
-        
-        # Start the background thread
-        thread = threading.Thread(target=process_in_background)
-        thread.daemon = True
-        thread.start()
-    
-    def update_with_response(self, response, progress_frame, response_start_mark):
-        """Update the note with the AI response after processing"""
-        # Remove the progress indicator
-        progress_frame.destroy()
-        
-        # Replace the processing message with the AI response
-        # Clean up any extra whitespace at the start or end of the response
-        response = response.strip()
-        
-        # Replace the processing message with the AI response
-        self.text_area.delete(response_start_mark, 'end-1c')
-        self.text_area.insert(response_start_mark, response + "\n\n")  # Add newlines after response
-        self.text_area.see(response_start_mark)  # Scroll to show the response
+        # Stream the response into the note as it is generated
+        writer = TextStreamWriter(
+            self.text_area,
+            response_start_mark,
+            on_done=self.update_with_response,
+            on_error=lambda error_msg: self.update_with_error(error_msg, response_start_mark)
+        )
+        
+        def show_queue_position(position, eta):
+            status = describe_queue_position(position, eta)
+            writer.set_status(f"[{status}]" if status else "[Processing AI request...]")
+        
+        future = services.generate_notes(topic, context, on_delta=writer.feed, source="notes", on_queue=show_queue_position)
+        writer.track(future)
+        self.track_request(future)
+        
+        # Cancelled if the note is closed or deleted before the response is complete
+        self.note_writers = [note_writer for note_writer in self.note_writers if note_writer.running()]
+        self.note_writers.append(writer)
+    
+    def update_with_response(self, response):
+        """Finish the note once the AI response has been streamed in"""
+        # Add newlines after the response
+        self.text_area.insert('end-1c', "\n\n")
         
         # Save the note with the new content
         self.save_current_note()
 
-    def update_with_error(self, error_msg, progress_frame, response_start_mark):
+    def update_with_error(self, error_msg, response_start_mark):
         """Update the note with an error message"""
-        # Remove the progress indicator
-        progress_frame.destroy()
-        
         # Replace the processing message with the error
         self.text_area.delete(response_start_mark, 'end-1c')
         self.text_area.insert(response_start_mark, f"[Error: {error_msg}]\n\n")  # Add newlines after error
@@ -494,13 +869,26 @@ class NotesPage(tk.Frame):
         # Show an error dialog
         messagebox.showerror("Error", error_msg)
 
-class FeedbackPage(tk.Frame):
+class FeedbackPage(AIPage):
     def __init__(self, parent):
         super().__init__(parent)
         self.setup_ui()
         self.load_subjects()
         self.load_assignment_types()
 
+    def refresh(self):
+        """Reload the dropdowns when the page is shown again, keeping the current selection"""
+        subject_name = self.subject_dropdown.get()
+        assignment_type_name = self.assignment_type_dropdown.get()
+        
+        self.load_subjects()
+        self.load_assignment_types()
+        
+        if subject_name in self.subject_dropdown['values']:
+            self.subject_dropdown.set(subject_name)
+        if assignment_type_name in self.assignment_type_dropdown['values']:
+            self.assignment_type_dropdown.set(assignment_type_name)
+
     def load_subjects(self):
         """Load subjects into the dropdown"""
         subject_names = subjects.get_subject_names()
@@ -616,7 +1004,7 @@ class FeedbackPage(tk.Frame):
             return
         
         # Check API connection first
-        APICheckWindow(self, self.on_api_check_complete)
+        check_api_connection(self, self.on_api_check_complete)
     
     def on_api_check_complete(self, api_connected):
         if not api_connected:
@@ -628,24 +1016,9 @@ class FeedbackPage(tk.Frame):
         
         # Get the subject, assignment type, and assignment text
         subject_name = self.subject_dropdown.get()
-        subject = subjects.get_subject_by_name(subject_name)
-        
         assignment_type_name = self.assignment_type_dropdown.get()
-        assignment_type = assignment_types.get_assignment_type_by_name(assignment_type_name)
-        
         assignment_text = self.assignment_text.get('1.0', 'end-1c').strip()
         
-        # Prepare context with subject and assignment type info
-        context = f"Subject: {subject_name}\n"
-        if subject and subject.get("description"):
-            context += f"Subject Description: {subject['description']}\n\n"
-        
-        context += f"Assignment Type: {assignment_type_name}\n"
-        if assignment_type and assignment_type.get("description"):
-            context += f"Assignment Type Description: {assignment_type['description']}\n\n"
-        
-        context += f"Assignment Text:\n{assignment_text}"
-        
         # Disable buttons while processing
         self.get_feedback_button.config(state='disabled')
         self.clear_button.config(state='disabled')
@@ -658,39 +1031,38 @@ class FeedbackPage(tk.Frame):
         self.feedback_text.config(state='disabled')
         self.update_idletasks()
         
-        # Process in background thread
-        def process_in_background():
-            try:
-                # Call AI handler with feedback role
-                response = ai_handler.generate_response(
-                    topic=f"Assignment Feedback for {subject_name} - {assignment_type_name}",
-                    context=context,
-                    role="feedback_giver"
-                )
-                
-                # Update UI on main thread
-                self.after(0, lambda: self.update_with_feedback(response))
-                
-            except Exception as e:
-                error_msg = f"An error occurred: {str(e)}"
-                self.after(0, lambda: self.update_with_error(error_msg))
-        
-        # Start background thread
-        thread = threading.Thread(target=process_in_background)
-        thread.daemon = True
-        thread.start()
+        # Stream the feedback into the text box as it is generated
+        writer = TextStreamWriter(
+            self.feedback_text,
+            '1.0',
+            on_done=self.update_with_feedback,
+            on_error=self.update_with_error
+        )
+        def show_progress(done, total):
+            # Long assignments are reviewed section by section
+            if done < total:
+                writer.set_status(f"Long assignment: reviewed {done} of {total} sections... Please wait.")
+            else:
+                writer.set_status(f"Combining the feedback on all {total} sections... Please wait.")
+        
+        def show_queue_position(position, eta):
+            writer.set_status(describe_queue_position(position, eta) or "Processing your assignment... Please wait.")
+        
+        future = services.generate_feedback(
+            subject_name, assignment_type_name, assignment_text,
+            on_delta=writer.feed,
+            on_progress=show_progress,
+            source="feedback",
+            on_queue=show_queue_position
+        )
+        writer.track(future)
+        self.track_request(future)
     
     def update_with_feedback(self, feedback):
-        # Enable buttons
+        """Re-enable the buttons once the feedback has been streamed in"""
         self.get_feedback_button.config(state='normal')
         self.clear_button.config(state='normal')
         self.export_button.config(state='normal')
-        
-        # Update feedback text
-        self.feedback_text.config(state='normal')
-        self.feedback_text.delete('1.0', 'end')
-        self.feedback_text.insert('1.0', feedback)
-        self.feedback_text.config(state='disabled')
     
     def update_with_error(self, error_msg):
         # Enable buttons
@@ -728,38 +1100,11 @@ class FeedbackPage(tk.Frame):
         subject_name = self.subject_dropdown.get()
         assignment_type_name = self.assignment_type_dropdown.get()
         
-        # Create a title based on subject and assignment type
-        note_title = f"Feedback: {subject_name} - {assignment_type_name}"
-        
-        # Format the note content with both assignment and feedback
-        note_content = f"SUBJECT: {subject_name}\n"
-        note_content += f"ASSIGNMENT TYPE: {assignment_type_name}\n\n"
-        note_content += f"ASSIGNMENT TEXT:\n{'-' * 80}\n{assignment_text}\n{'-' * 80}\n\n"
-        note_content += f"FEEDBACK:\n{'-' * 80}\n{feedback}\n{'-' * 80}\n"
-        
         try:
-            # Create a new note
-            note_id = 0
-            existing_notes = [int(f.split('_')[1].split('.')[0]) for f in os.listdir(NOTES_DIR) 
-                             if f.startswith('note_') and f.endswith('.json')]
-            if existing_notes:
-                note_id = max(existing_notes) + 1
-            
-            # Create note data
-            note_data = {
-                "id": note_id,
-                "title": note_title,
-                "content": note_content
-            }
+            # Create a new note with both the assignment and the feedback
+            note = services.export_feedback_note(subject_name, assignment_type_name, assignment_text, feedback)
             
-            # Save to disk
-            filename = f"note_{note_id}.json"
-            file_path = os.path.join(NOTES_DIR, filename)
-            
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(note_data, f, ensure_ascii=False, indent=2)
-            
-            messagebox.showinfo("Export Successful", f"Feedback exported to Notes as '{note_title}'")
+            messagebox.showinfo("Export Successful", f"Feedback exported to Notes as '{note['title']}'")
             
         except Exception as e:
             messagebox.showerror("Export Error", f"Failed to export to Notes: {str(e)}")
@@ -905,7 +1250,9 @@ class SubjectManagerDialog(tk.Toplevel):
         
         if success:
             messagebox.showinfo("Success", "Subject updated successfully.")
-            self.load_subjects()
+        else:
+            messagebox.showwarning("Error", "The change could not be saved to subjects.json yet and will be retried. Make sure the file isn't open in another program.")
+        self.load_subjects()
     
     def delete_subject(self):
         """Delete the current subject"""
@@ -923,11 +1270,13 @@ class SubjectManagerDialog(tk.Toplevel):
         
         if success:
             messagebox.showinfo("Success", "Subject deleted successfully.")
-            self.current_subject_id = None
-            self.name_entry.delete(0, tk.END)
-            self.desc_text.delete('1.0', tk.END)
-            self.update_button_states()
-            self.load_subjects()
+        else:
+            messagebox.showwarning("Error", "The change could not be saved to subjects.json yet and will be retried. Make sure the file isn't open in another program.")
+        self.current_subject_id = None
+        self.name_entry.delete(0, tk.END)
+        self.desc_text.delete('1.0', tk.END)
+        self.update_button_states()
+        self.load_subjects()
     
     def new_subject(self):
         """Create a new subject"""
@@ -957,15 +1306,19 @@ class SubjectManagerDialog(tk.Toplevel):
             messagebox.showwarning("Missing Information", "Please enter a subject name.")
             return
         
+        if subjects.get_subject_by_name(name):
+            messagebox.showwarning("Error", "A subject with this name already exists.")
+            return
+        
         # Add new subject
         success = subjects.add_subject(name, description)
         
         if success:
             messagebox.showinfo("Success", "Subject added successfully.")
-            self.save_button.config(command=self.save_subject)
-            self.load_subjects()
         else:
-            messagebox.showwarning("Error", "A subject with this name already exists.")
+            messagebox.showwarning("Error", "The change could not be saved to subjects.json yet and will be retried. Make sure the file isn't open in another program.")
+        self.save_button.config(command=self.save_subject)
+        self.load_subjects()
 
 class AssignmentTypeManagerDialog(tk.Toplevel):
     def __init__(self, parent):
@@ -1108,7 +1461,9 @@ class AssignmentTypeManagerDialog(tk.Toplevel):
         
         if success:
             messagebox.showinfo("Success", "Assignment type updated successfully.")
-            self.load_types()
+        else:
+            messagebox.showwarning("Error", "The change could not be saved to assignment_types.json yet and will be retried. Make sure the file isn't open in another program.")
+        self.load_types()
     
     def delete_type(self):
         """Delete the current assignment type"""
@@ -1126,11 +1481,13 @@ class AssignmentTypeManagerDialog(tk.Toplevel):
         
         if success:
             messagebox.showinfo("Success", "Assignment type deleted successfully.")
-            self.current_type_id = None
-            self.name_entry.delete(0, tk.END)
-            self.desc_text.delete('1.0', tk.END)
-            self.update_button_states()
-            self.load_types()
+        else:
+            messagebox.showwarning("Error", "The change could not be saved to assignment_types.json yet and will be retried. Make sure the file isn't open in another program.")
+        self.current_type_id = None
+        self.name_entry.delete(0, tk.END)
+        self.desc_text.delete('1.0', tk.END)
+        self.update_button_states()
+        self.load_types()
     
     def new_type(self):
         """Create a new assignment type"""
@@ -1160,23 +1517,40 @@ class AssignmentTypeManagerDialog(tk.Toplevel):
             messagebox.showwarning("Missing Information", "Please enter an assignment type name.")
             return
         
+        if assignment_types.get_assignment_type_by_name(name):
+            messagebox.showwarning("Error", "An assignment type with this name already exists.")
+            return
+        
         # Add new type
         success = assignment_types.add_assignment_type(name, description)
         
         if success:
             messagebox.showinfo("Success", "Assignment type added successfully.")
-            self.save_button.config(command=self.save_type)
-            self.load_types()
         else:
-            messagebox.showwarning("Error", "An assignment type with this name already exists.")
+            messagebox.showwarning("Error", "The change could not be saved to assignment_types.json yet and will be retried. Make sure the file isn't open in another program.")
+        self.save_button.config(command=self.save_type)
+        self.load_types()
 
-class StarterPage(tk.Frame):
+class StarterPage(AIPage):
     def __init__(self, parent):
         super().__init__(parent)
         self.setup_ui()
         self.load_subjects()
         self.load_assignment_types()
 
+    def refresh(self):
+        """Reload the dropdowns when the page is shown again, keeping the current selection"""
+        subject_name = self.subject_dropdown.get()
+        assignment_type_name = self.assignment_type.get()
+        
+        self.load_subjects()
+        self.load_assignment_types()
+        
+        if subject_name in self.subject_dropdown['values']:
+            self.subject_dropdown.set(subject_name)
+        if assignment_type_name in self.assignment_type['values']:
+            self.assignment_type.set(assignment_type_name)
+
     def load_subjects(self):
         """Load subjects into the dropdown"""
         subject_names = subjects.get_subject_names()
@@ -1292,7 +1666,7 @@ class StarterPage(tk.Frame):
             return
         
         # Check API connection first
-        APICheckWindow(self, self.on_api_check_complete)
+        check_api_connection(self, self.on_api_check_complete)
     
     def on_api_check_complete(self, api_connected):
         if not api_connected:
@@ -1304,24 +1678,9 @@ class StarterPage(tk.Frame):
         
         # Get inputs
         subject_name = self.subject_dropdown.get()
-        subject = subjects.get_subject_by_name(subject_name)
-        
         assignment_type_name = self.assignment_type.get()
-        assignment_type = assignment_types.get_assignment_type_by_name(assignment_type_name)
-        
         description = self.description_text.get('1.0', 'end-1c').strip()
         
-        # Prepare context with subject and assignment type info
-        context = f"Subject: {subject_name}\n"
-        if subject and subject.get("description"):
-            context += f"Subject Description: {subject['description']}\n\n"
-        
-        context += f"Assignment Type: {assignment_type_name}\n"
-        if assignment_type and assignment_type.get("description"):
-            context += f"Assignment Type Description: {assignment_type['description']}\n\n"
-        
-        context += f"Assignment Description: {description}"
-        
         # Disable buttons while processing
         self.generate_button.config(state='disabled')
         self.clear_button.config(state='disabled')
@@ -1334,39 +1693,30 @@ class StarterPage(tk.Frame):
         self.output_text.config(state='disabled')
         self.update_idletasks()
         
-        # Process in background thread
-        def process_in_background():
-            try:
-                # Call AI handler with assignment_starter role
-                response = ai_handler.generate_response(
-                    topic=f"Assignment Starter for {subject_name} - {assignment_type_name}",
-                    context=context,
-                    role="assignment_starter"
-                )
-                
-                # Update UI on main thread
-                self.after(0, lambda: self.update_with_starter(response))
-                
-            except Exception as e:
-                error_msg = f"An error occurred: {str(e)}"
-                self.after(0, lambda: self.update_with_error(error_msg))
-        
-        # Start background thread
-        thread = threading.Thread(target=process_in_background)
-        thread.daemon = True
-        thread.start()
+        # Stream the starter content into the text box as it is generated
+        writer = TextStreamWriter(
+            self.output_text,
+            '1.0',
+            on_done=self.update_with_starter,
+            on_error=self.update_with_error
+        )
+        def show_queue_position(position, eta):
+            writer.set_status(describe_queue_position(position, eta) or "Generating starter content... Please wait.")
+        
+        future = services.generate_starter(
+            subject_name, assignment_type_name, description,
+            on_delta=writer.feed,
+            source="starter",
+            on_queue=show_queue_position
+        )
+        writer.track(future)
+        self.track_request(future)
     
     def update_with_starter(self, starter_content):
-        # Enable buttons
+        """Re-enable the buttons once the starter content has been streamed in"""
         self.generate_button.config(state='normal')
         self.clear_button.config(state='normal')
         self.export_button.config(state='normal')
-        
-        # Update output text
-        self.output_text.config(state='normal')
-        self.output_text.delete('1.0', 'end')
-        self.output_text.insert('1.0', starter_content)
-        self.output_text.config(state='disabled')
     
     def update_with_error(self, error_msg):
         # Enable buttons
@@ -1404,38 +1754,11 @@ class StarterPage(tk.Frame):
         subject_name = self.subject_dropdown.get()
         assignment_type_name = self.assignment_type.get()
         
-        # Create a title based on subject and assignment type
-        note_title = f"Starter: {subject_name} - {assignment_type_name}"
-        
-        # Format the note content with both description and starter content
-        note_content = f"SUBJECT: {subject_name}\n"
-        note_content += f"ASSIGNMENT TYPE: {assignment_type_name}\n\n"
-        note_content += f"ASSIGNMENT DESCRIPTION:\n{'-' * 80}\n{description}\n{'-' * 80}\n\n"
-        note_content += f"STARTER CONTENT:\n{'-' * 80}\n{starter_content}\n{'-' * 80}\n"
-        
         try:
-            # Create a new note
-            note_id = 0
-            existing_notes = [int(f.split('_')[1].split('.')[0]) for f in os.listdir(NOTES_DIR) 
-                             if f.startswith('note_') and f.endswith('.json')]
-            if existing_notes:
-                note_id = max(existing_notes) + 1
-            
-            # Create note data
-            note_data = {
-                "id": note_id,
-                "title": note_title,
-                "content": note_content
-            }
-            
-            # Save to disk
-            filename = f"note_{note_id}.json"
-            file_path = os.path.join(NOTES_DIR, filename)
-            
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(note_data, f, ensure_ascii=False, indent=2)
+            # Create a new note with both the description and the starter content
+            note = services.export_starter_note(subject_name, assignment_type_name, description, starter_content)
             
-            messagebox.showinfo("Export Successful", f"Starter content exported to Notes as '{note_title}'")
+            messagebox.showinfo("Export Successful", f"Starter content exported to Notes as '{note['title']}'")
             
         except Exception as e:
             messagebox.showerror("Export Error", f"Failed to export to Notes: {str(e)}") 
\ No newline at end of file
@@ -0,0 +1,132 @@
+import os
+import json
+import time
+import atexit
+import tempfile
+import threading
+from typing import Callable, Any
+
+# Seconds a scheduled write waits for more writes to the same key before running
+WRITE_BEHIND_DELAY = 0.25
+
+# Seconds the program waits at exit for writes that keep failing (e.g. on a locked database)
+EXIT_FLUSH_TIMEOUT = 30
+
+def atomic_write_text(file_path: str, text: str):
+    """
+    Write text to a file so that it is never left half-written
+    
+    The text is written to a temporary file in the same directory, flushed
+    to disk and then moved over the target in one step.
+    """
+    directory = os.path.dirname(os.path.abspath(file_path))
+    fd, temp_path = tempfile.mkstemp(prefix=".tmp_", suffix=os.path.splitext(file_path)[1], dir=directory)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, file_path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+    
+    # Make the rename itself durable (not supported on Windows)
+    if hasattr(os, "O_DIRECTORY"):
+        dir_fd = os.open(directory, os.O_RDONLY | os.O_DIRECTORY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+def atomic_write_json(file_path: str, data: Any):
+    """Write JSON to a file so that it is never left half-written"""
+    atomic_write_text(file_path, json.dumps(data, ensure_ascii=False, indent=2))
+
+class WriteBehindQueue:
+    """
+    Runs scheduled writes on a background thread
+    
+    Writes are keyed (e.g. by file path). Scheduling a write for a key that
+    already has one waiting replaces it, so a burst of saves to the same
+    file or note ends up as a single disk write.
+    """
+    
+    def __init__(self, delay: float = WRITE_BEHIND_DELAY):
+        self.delay = delay
+        self.condition = threading.Condition()
+        self.pending = {}  # key -> (write function, time it becomes due)
+        self.active = 0  # Writes currently running
+        self.thread = None
+    
+    def schedule(self, key: str, write: Callable[[], None], delay: float = None):
+        """Schedule a write, replacing any write still waiting for the same key"""
+        with self.condition:
+            due = self.pending[key][1] if key in self.pending else time.monotonic() + (self.delay if delay is None else delay)
+            self.pending[key] = (write, due)
+            if self.thread is None:
+                self.thread = threading.Thread(target=self.run, name="write-behind")
+                self.thread.daemon = True
+                self.thread.start()
+            self.condition.notify_all()
+    
+    def flush(self, timeout: float = None) -> bool:
+        """Run every waiting write now and block until they are done"""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self.condition:
+            now = time.monotonic()
+            self.pending = {key: (write, now) for key, (write, _) in self.pending.items()}
+            self.condition.notify_all()
+            
+            while self.pending or self.active:
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return False
+                self.condition.wait(remaining)
+        return True
+    
+    def run(self):
+        while True:
+            with self.condition:
+                while True:
+                    now = time.monotonic()
+                    due_keys = [key for key, (_, due) in self.pending.items() if due <= now]
+                    if due_keys:
+                        break
+                    next_due = min((due for _, due in self.pending.values()), default=None)
+                    self.condition.wait(None if next_due is None else next_due - now)
+                
+                writes = [self.pending.pop(key)[0] for key in due_keys]
+                self.active += len(writes)
+            
+            for write in writes:
+                try:
+                    write()
+                except Exception as e:
+                    print(f"Error in background write: {e}")
+                finally:
+                    with self.condition:
+                        self.active -= 1
+                        self.condition.notify_all()
+
+# Shared by every module that saves data
+writer = WriteBehindQueue()
+
+def schedule_write(key: str, write: Callable[[], None], delay: float = None):
+    """Run a write on the background writer thread, coalescing writes with the same key"""
+    writer.schedule(key, write, delay)
+
+def flush(timeout: float = None) -> bool:
+    """Wait until every scheduled write has reached the disk"""
+    return writer.flush(timeout)
+
+def flush_before_exit():
+    """Wait for scheduled writes before exiting, but not forever if some keep failing"""
+    if not flush(EXIT_FLUSH_TIMEOUT):
+        print(f"Warning: some changes could not be saved within {EXIT_FLUSH_TIMEOUT} seconds and were lost")
+
+# Don't lose scheduled writes when the program exits
+atexit.register(flush_before_exit)
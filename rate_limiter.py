@@ -0,0 +1,76 @@
+import time
+import asyncio
+
+class TokenBucket:
+    """A bucket that refills continuously up to its capacity"""
+    
+    def __init__(self, capacity: float, refill_per_second: float):
+        self.capacity = capacity
+        self.refill_per_second = refill_per_second
+        self.available = capacity
+        self.updated_at = time.monotonic()
+    
+    def refill(self, now: float):
+        elapsed = now - self.updated_at
+        self.available = min(self.capacity, self.available + elapsed * self.refill_per_second)
+        self.updated_at = now
+    
+    def wait_time(self, amount: float) -> float:
+        """Seconds until the given amount is available (0 if it is available now)"""
+        amount = min(amount, self.capacity)  # Oversized requests only have to wait for a full bucket
+        if self.available >= amount:
+            return 0.0
+        return (amount - self.available) / self.refill_per_second
+    
+    def take(self, amount: float):
+        self.available -= min(amount, self.capacity)
+    
+    def give_back(self, amount: float):
+        self.available = min(self.capacity, self.available + amount)
+
+class RateLimiter:
+    """
+    Client-side pacing for the OpenAI API, limiting both requests and tokens per minute
+    
+    All requests go through one event loop, so a single limiter paces every
+    page (and batch job) sharing the API key instead of letting each one run
+    into 429 errors on its own. A limit of 0 disables that bucket.
+    """
+    
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.request_bucket = TokenBucket(requests_per_minute, requests_per_minute / 60) if requests_per_minute > 0 else None
+        self.token_bucket = TokenBucket(tokens_per_minute, tokens_per_minute / 60) if tokens_per_minute > 0 else None
+        self.paused_until = 0.0
+    
+    def wait_time(self, tokens: int) -> float:
+        """Seconds until a request using the given number of tokens may be sent (0 if it may be sent now)"""
+        now = time.monotonic()
+        wait = self.paused_until - now
+        
+        for bucket, amount in ((self.request_bucket, 1), (self.token_bucket, tokens)):
+            if bucket is not None:
+                bucket.refill(now)
+                wait = max(wait, bucket.wait_time(amount))
+        return max(0.0, wait)
+    
+    async def acquire(self, tokens: int):
+        """Wait until a request using the given number of tokens may be sent"""
+        while True:
+            wait = self.wait_time(tokens)
+            if wait <= 0:
+                if self.request_bucket is not None:
+                    self.request_bucket.take(1)
+                if self.token_bucket is not None:
+                    self.token_bucket.take(tokens)
+                return
+            
+            await asyncio.sleep(wait)
+    
+    def refund_tokens(self, tokens: int):
+        """Return tokens that were reserved but not used by a request"""
+        if self.token_bucket is not None and tokens > 0:
+            self.token_bucket.give_back(tokens)
+    
+    def pause(self, seconds: float):
+        """Hold back all requests, e.g. after the API reported a rate limit"""
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
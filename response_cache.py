@@ -0,0 +1,155 @@
+import os
+import json
+import time
+import sqlite3
+import hashlib
+import threading
+from typing import List, Dict, Optional
+from dotenv import load_dotenv
+from constants import APP_DIR
+import persistence
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Constants
+CACHE_FILE = os.path.join(APP_DIR, "response_cache.sqlite3")
+CACHE_MAX_BYTES = int(os.getenv("RESPONSE_CACHE_MAX_MB", "50")) * 1024 * 1024
+CACHE_MAX_AGE = float(os.getenv("RESPONSE_CACHE_MAX_AGE_DAYS", "30")) * 24 * 60 * 60
+
+# Ensure the app directory exists
+os.makedirs(APP_DIR, exist_ok=True)
+
+_lock = threading.Lock()
+_connection = None
+_stats = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0}
+_pending = {}  # Responses waiting to be written by the background writer, by key
+_pending_lock = threading.Lock()
+
+def _get_connection():
+    """Open the cache database on first use"""
+    global _connection
+    if _connection is None:
+        _connection = sqlite3.connect(CACHE_FILE, check_same_thread=False)
+        _connection.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, "
+            "response TEXT NOT NULL, "
+            "size INTEGER NOT NULL, "
+            "created_at REAL NOT NULL, "
+            "accessed_at REAL NOT NULL)"
+        )
+        _connection.execute("CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)")
+        _connection.commit()
+    return _connection
+
+def make_key(model: str, max_completion_tokens: int, messages: List[Dict[str, str]]) -> str:
+    """Hash everything that determines a response into a cache key"""
+    payload = json.dumps(
+        {"model": model, "max_completion_tokens": max_completion_tokens, "messages": messages},
+        ensure_ascii=False,
+        sort_keys=True
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def get(key: str) -> Optional[str]:
+    """Get a cached response, or None if there is no usable entry"""
+    with _pending_lock:
+        response = _pending.get(key)
+    if response is not None:
+        with _lock:
+            _stats["hits"] += 1
+        return response
+    
+    now = time.time()
+    try:
+        with _lock:
+            connection = _get_connection()
+            row = connection.execute(
+                "SELECT response, created_at FROM responses WHERE key = ?", (key,)
+            ).fetchone()
+            
+            if row is None or now - row[1] > CACHE_MAX_AGE:
+                _stats["misses"] += 1
+                return None
+            
+            connection.execute("UPDATE responses SET accessed_at = ? WHERE key = ?", (now, key))
+            connection.commit()
+            _stats["hits"] += 1
+            return row[0]
+    except Exception as e:
+        print(f"Error reading response cache: {e}")
+        return None
+
+def put(key: str, response: str):
+    """Store a response (safe to call from any thread, the write happens in the background)"""
+    with _pending_lock:
+        _pending[key] = response
+    persistence.schedule_write("response_cache", _write_pending)
+
+def _write_pending():
+    """Write every pending response in one transaction and evict old entries if the cache is too big"""
+    with _pending_lock:
+        responses = list(_pending.items())
+    if not responses:
+        return
+    
+    now = time.time()
+    try:
+        with _lock:
+            connection = _get_connection()
+            connection.executemany(
+                "INSERT OR REPLACE INTO responses (key, response, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+                [(key, response, len(response.encode('utf-8')), now, now) for key, response in responses]
+            )
+            _stats["stores"] += len(responses)
+            _evict(connection, now)
+            connection.commit()
+    except Exception as e:
+        print(f"Error writing response cache: {e}")
+    
+    # Keep serving them from memory until they are written (or dropped after an error)
+    with _pending_lock:
+        for key, response in responses:
+            if _pending.get(key) is response:
+                del _pending[key]
+
+def _evict(connection, now):
+    """Remove expired entries, then the least recently used ones until under the size limit"""
+    removed = connection.execute("DELETE FROM responses WHERE created_at < ?", (now - CACHE_MAX_AGE,)).rowcount
+    
+    total_size = connection.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+    if total_size > CACHE_MAX_BYTES:
+        rows = connection.execute("SELECT key, size FROM responses ORDER BY accessed_at").fetchall()
+        for key, size in rows:
+            if total_size <= CACHE_MAX_BYTES:
+                break
+            connection.execute("DELETE FROM responses WHERE key = ?", (key,))
+            total_size -= size
+            removed += 1
+    
+    _stats["evictions"] += removed
+
+def clear():
+    """Remove every cached response"""
+    with _pending_lock:
+        _pending.clear()
+    with _lock:
+        connection = _get_connection()
+        connection.execute("DELETE FROM responses")
+        connection.commit()
+
+def get_stats() -> Dict[str, int]:
+    """Get the hit/miss counters for this session plus the current cache size"""
+    with _lock:
+        stats = dict(_stats)
+        try:
+            connection = _get_connection()
+            entries, total_size = connection.execute(
+                "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+            ).fetchone()
+            stats["entries"] = entries
+            stats["size_bytes"] = total_size
+        except Exception as e:
+            print(f"Error reading response cache: {e}")
+    return stats
@@ -0,0 +1,157 @@
+import time
+import asyncio
+from collections import OrderedDict, deque
+from typing import Callable, List, Optional
+
+# Priority classes, highest first. Interactive requests (someone is watching
+# the page) always start before batch work that is waiting.
+PRIORITIES = ("interactive", "batch")
+
+# Assumed request duration until real ones have been measured
+DEFAULT_REQUEST_SECONDS = 10.0
+
+class Ticket:
+    """A request's place in the scheduler queue"""
+    
+    def __init__(self, priority: str, source: str, on_update: Callable[[Optional[int], Optional[float]], None] = None):
+        if priority not in PRIORITIES:
+            raise ValueError(f"Unknown priority '{priority}', expected one of {', '.join(PRIORITIES)}")
+        self.priority = priority
+        self.source = source
+        self.on_update = on_update
+        self.granted = None  # Future resolved when the request may start
+        self.running = False  # Whether the request holds a slot
+        self.started_at = None
+        self.run_time = 0.0  # Seconds spent holding a slot, over every time it held one
+        self.last_update = None
+    
+    def notify(self, position: Optional[int], eta: Optional[float]):
+        """Tell the listener how many requests are ahead and about how long the wait is (None once started)"""
+        update = (position, None if eta is None else round(eta))
+        if self.on_update and update != self.last_update:
+            self.last_update = update
+            self.on_update(*update)
+
+class RequestScheduler:
+    """
+    Decides which waiting request may call the API next
+    
+    At most max_concurrent requests run at the same time. Waiting requests
+    are started by priority class, and within a class in turn per source
+    (page or batch job), so one source queueing many requests doesn't hold
+    up the others. Must only be used from the event loop thread.
+    """
+    
+    def __init__(self, max_concurrent: int):
+        self.max_concurrent = max(1, max_concurrent)
+        self.active = 0
+        self.queues = {priority: OrderedDict() for priority in PRIORITIES}  # source -> deque of tickets
+        self.durations = deque(maxlen=50)  # Seconds taken by recent requests, for wait estimates
+    
+    def set_max_concurrent(self, max_concurrent: int):
+        """Change the number of requests that may run at the same time"""
+        self.max_concurrent = max(1, max_concurrent)
+        self.dispatch()  # Start waiting requests if the limit went up
+    
+    async def acquire(self, ticket: Ticket):
+        """Wait until the request may start"""
+        ticket.granted = asyncio.get_running_loop().create_future()
+        self.queues[ticket.priority].setdefault(ticket.source, deque()).append(ticket)
+        self.dispatch()
+        
+        try:
+            await ticket.granted
+        except asyncio.CancelledError:
+            if ticket.granted.done() and not ticket.granted.cancelled():
+                # Started and cancelled in the same step, hand the slot on
+                ticket.running = True
+                self.release(ticket)
+            else:
+                self.remove(ticket)
+                self.update_waiting()
+            raise
+        ticket.running = True
+        ticket.started_at = time.monotonic()
+        ticket.notify(None, None)
+    
+    def release(self, ticket: Ticket, finished: bool = True):
+        """
+        Free the slot of a request
+        
+        finished is False when the request only pauses (e.g. to back off before
+        a retry) and will acquire a slot again. Releasing a ticket that doesn't
+        hold a slot does nothing.
+        """
+        if not ticket.running:
+            return
+        ticket.running = False
+        if ticket.started_at is not None:
+            ticket.run_time += time.monotonic() - ticket.started_at
+        if finished:
+            self.durations.append(ticket.run_time)
+        self.active -= 1
+        self.dispatch()
+    
+    def promote(self, ticket: Ticket, priority: str):
+        """Move a waiting request to a higher priority class"""
+        if PRIORITIES.index(priority) >= PRIORITIES.index(ticket.priority):
+            return
+        if ticket.granted is None or ticket.granted.done():
+            ticket.priority = priority
+            return
+        self.remove(ticket)
+        ticket.priority = priority
+        self.queues[priority].setdefault(ticket.source, deque()).append(ticket)
+        self.dispatch()
+    
+    def remove(self, ticket: Ticket):
+        sources = self.queues[ticket.priority]
+        waiting = sources.get(ticket.source)
+        if waiting and ticket in waiting:
+            waiting.remove(ticket)
+            if not waiting:
+                del sources[ticket.source]
+    
+    def next_ticket(self) -> Optional[Ticket]:
+        """Take the next waiting request, rotating between sources within the highest waiting class"""
+        for priority in PRIORITIES:
+            sources = self.queues[priority]
+            if sources:
+                source, waiting = sources.popitem(last=False)
+                ticket = waiting.popleft()
+                if waiting:
+                    sources[source] = waiting  # Back of the line for this source's next request
+                return ticket
+        return None
+    
+    def dispatch(self):
+        """Start waiting requests while there are free slots"""
+        while self.active < self.max_concurrent:
+            ticket = self.next_ticket()
+            if ticket is None:
+                break
+            if ticket.granted.done():
+                continue  # Cancelled while waiting
+            self.active += 1
+            ticket.granted.set_result(None)
+        self.update_waiting()
+    
+    def waiting_order(self) -> List[Ticket]:
+        """Waiting requests in the order they will start"""
+        order = []
+        for priority in PRIORITIES:
+            waiting = [list(tickets) for tickets in self.queues[priority].values()]
+            for turn in range(max((len(tickets) for tickets in waiting), default=0)):
+                order.extend(tickets[turn] for tickets in waiting if turn < len(tickets))
+        return order
+    
+    def estimate_wait(self, position: int) -> float:
+        """Seconds until the request with the given number of requests ahead of it can start"""
+        average = sum(self.durations) / len(self.durations) if self.durations else DEFAULT_REQUEST_SECONDS
+        return average * (position + 1) / self.max_concurrent
+    
+    def update_waiting(self):
+        """Send every waiting request its current position and wait estimate"""
+        for position, ticket in enumerate(self.waiting_order()):
+            if ticket.on_update:
+                ticket.notify(position, self.estimate_wait(position))
@@ -0,0 +1,295 @@
+"""
+The program's AI tasks without any UI
+
+Builds the prompts for notes, assignment feedback and assignment starters and
+submits them through ai_handler, so the pages, scripts and benchmarks all use
+the same code path. Every generate_* function returns a concurrent future that
+resolves to the response text, and streams the text to on_delta if given.
+priority, source and on_queue are passed on to the ai_handler scheduler.
+"""
+import os
+import re
+import asyncio
+import concurrent.futures
+from typing import Callable, Dict, List, Optional
+from dotenv import load_dotenv
+import ai_handler
+import subjects
+import assignment_types
+import note_store
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Assignments longer than this are reviewed section by section, concurrently,
+# and the section feedback is merged in a final request
+LONG_DOCUMENT_CHARS = int(os.getenv("FEEDBACK_LONG_DOCUMENT_CHARS", "16000"))  # About 4000 tokens
+FEEDBACK_CHUNK_CHARS = int(os.getenv("FEEDBACK_CHUNK_CHARS", "8000"))
+
+# Lines that look like section headings: numbered ("2.1 Method"), markdown ("## Results")
+# or short lines without closing punctuation ("Introduction", "LITERATURE REVIEW")
+HEADING_PATTERN = re.compile(r"^(#{1,6}\s+\S.*|(\d+(\.\d+)*\.?|[IVX]+\.)\s+\S.{0,80}|[A-Z][^.!?:;]{0,60})$")
+
+def describe_assignment(subject_name: str, assignment_type_name: str) -> str:
+    """
+    Name and describe the subject and assignment type
+    
+    Sent as system context, so it only depends on the subject and assignment
+    type and every request for the same pair starts with the same text.
+    """
+    subject = subjects.get_subject_by_name(subject_name)
+    assignment_type = assignment_types.get_assignment_type_by_name(assignment_type_name)
+    
+    context = f"Subject: {subject_name}\n"
+    if subject and subject.get("description"):
+        context += f"Subject Description: {subject['description']}\n"
+    
+    context += f"\nAssignment Type: {assignment_type_name}\n"
+    if assignment_type and assignment_type.get("description"):
+        context += f"Assignment Type Description: {assignment_type['description']}\n"
+    return context.strip()
+
+def generate_notes(
+    topic: str,
+    context: str,
+    on_delta: Optional[Callable[[str], None]] = None,
+    use_cache: bool = True,
+    priority: str = "interactive",
+    source: str = None,
+    on_queue: Optional[Callable[[Optional[int], Optional[float]], None]] = None
+) -> concurrent.futures.Future:
+    """Generate notes on a topic"""
+    return ai_handler.submit_response(
+        topic=topic,
+        context=context,
+        role="note_taker",
+        use_cache=use_cache,
+        on_delta=on_delta,
+        priority=priority,
+        source=source,
+        on_queue=on_queue
+    )
+
+def generate_feedback(
+    subject_name: str,
+    assignment_type_name: str,
+    assignment_text: str,
+    on_delta: Optional[Callable[[str], None]] = None,
+    use_cache: bool = True,
+    on_progress: Optional[Callable[[int, int], None]] = None,
+    priority: str = "interactive",
+    source: str = None,
+    on_queue: Optional[Callable[[Optional[int], Optional[float]], None]] = None,
+    raise_errors: bool = False
+) -> concurrent.futures.Future:
+    """
+    Generate feedback on an assignment
+    
+    Assignments longer than LONG_DOCUMENT_CHARS are split into sections that
+    are reviewed concurrently before one final request merges the feedback.
+    on_progress(sections_done, sections) is then called from the event loop
+    thread as sections finish. Only the merged feedback is streamed to on_delta,
+    and on_queue is not used. With raise_errors the future raises failures
+    instead of resolving to an error message.
+    """
+    if len(assignment_text) > LONG_DOCUMENT_CHARS:
+        sections = split_into_sections(assignment_text, FEEDBACK_CHUNK_CHARS)
+        if len(sections) > 1:
+            return ai_handler.submit(_generate_long_feedback(
+                subject_name, assignment_type_name, sections, on_delta, use_cache, on_progress, priority, source, raise_errors
+            ))
+    
+    return ai_handler.submit_response(
+        topic=f"Assignment Feedback for {subject_name} - {assignment_type_name}",
+        context=f"Assignment Text:\n{assignment_text}",
+        role="feedback_giver",
+        use_cache=use_cache,
+        tags={"subject": subject_name, "assignment_type": assignment_type_name},
+        system_context=describe_assignment(subject_name, assignment_type_name),
+        on_delta=on_delta,
+        priority=priority,
+        source=source,
+        on_queue=on_queue,
+        raise_errors=raise_errors
+    )
+
+def is_heading(line: str) -> bool:
+    return bool(HEADING_PATTERN.match(line.strip()))
+
+def split_into_sections(text: str, max_chars: int) -> List[str]:
+    """
+    Split a long text into chunks of at most max_chars, preferring section breaks
+    
+    Chunks are built from whole paragraphs. A heading starts a new chunk once
+    the current one is at least half full, so sections stay together where
+    possible. Paragraphs longer than max_chars are split between sentences.
+    """
+    paragraphs = []
+    for paragraph in re.split(r"\n\s*\n", text):
+        paragraph = paragraph.strip()
+        if not paragraph:
+            continue
+        if len(paragraph) <= max_chars:
+            paragraphs.append(paragraph)
+            continue
+        
+        # Split an oversized paragraph between sentences, or hard if a sentence is too long too
+        piece = ""
+        for sentence in re.split(r"(?<=[.!?])\s+", paragraph):
+            while len(sentence) > max_chars:
+                if piece:
+                    paragraphs.append(piece)
+                    piece = ""
+                paragraphs.append(sentence[:max_chars])
+                sentence = sentence[max_chars:]
+            if piece and len(piece) + 1 + len(sentence) > max_chars:
+                paragraphs.append(piece)
+                piece = ""
+            piece = f"{piece} {sentence}" if piece else sentence
+        if piece:
+            paragraphs.append(piece)
+    
+    chunks = []
+    current = []
+    current_size = 0
+    for paragraph in paragraphs:
+        starts_section = is_heading(paragraph.split("\n", 1)[0])
+        if current and (current_size + 2 + len(paragraph) > max_chars or (starts_section and current_size >= max_chars // 2)):
+            chunks.append("\n\n".join(current))
+            current = []
+            current_size = 0
+        current.append(paragraph)
+        current_size += len(paragraph) + 2
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+async def _generate_long_feedback(subject_name, assignment_type_name, sections, on_delta, use_cache, on_progress, priority, source, raise_errors):
+    """Review every section concurrently, then merge the section feedback into one response"""
+    topic = f"Assignment Feedback for {subject_name} - {assignment_type_name}"
+    system_context = describe_assignment(subject_name, assignment_type_name)
+    tags = {"subject": subject_name, "assignment_type": assignment_type_name}
+    total = len(sections)
+    done = 0
+    
+    if on_progress:
+        on_progress(0, total)
+    
+    async def review_section(number, section):
+        nonlocal done
+        feedback = await ai_handler.agenerate_response(
+            topic=topic,
+            context=(
+                f"This is section {number} of {total} of a longer assignment. Give feedback on this section only, "
+                f"noting anything that depends on the rest of the assignment.\n\n"
+                f"Assignment Text (section {number} of {total}):\n{section}"
+            ),
+            role="feedback_giver",
+            use_cache=use_cache,
+            tags=tags,
+            system_context=system_context,
+            priority=priority,
+            source=source,
+            raise_errors=True
+        )
+        done += 1
+        if on_progress:
+            on_progress(done, total)
+        return feedback
+    
+    section_tasks = [asyncio.ensure_future(review_section(number, section)) for number, section in enumerate(sections, 1)]
+    try:
+        section_feedback = await asyncio.gather(*section_tasks)
+    except Exception as e:
+        # Without every section there is nothing to merge, so don't pay for the other reviews
+        for task in section_tasks:
+            task.cancel()
+        if raise_errors:
+            raise
+        error_message = f"{ai_handler.REQUEST_FAILED_ERROR} {str(e)}"
+        if on_delta:
+            on_delta(error_message)
+        return error_message
+    
+    # Merge the section feedback, with the outline so the overall structure can be judged
+    first_lines = [section.split("\n", 1)[0][:100] for section in sections]
+    outline = "\n".join(f"Section {number}: {line}" for number, line in enumerate(first_lines, 1))
+    reviews = "\n\n".join(f"FEEDBACK ON SECTION {number}:\n{feedback}" for number, feedback in enumerate(section_feedback, 1))
+    return await ai_handler.agenerate_response(
+        topic=topic,
+        context=(
+            f"The assignment was too long to review at once, so each of its {total} sections was reviewed separately. "
+            f"Combine the section feedback below into one feedback report on the whole assignment: highlight strengths, "
+            f"the most important areas needing work and actionable next steps, remove repetition, and comment on the "
+            f"overall structure using the outline.\n\n"
+            f"Outline (first line of each section):\n{outline}\n\n{reviews}"
+        ),
+        role="feedback_giver",
+        use_cache=use_cache,
+        on_delta=on_delta,
+        tags=tags,
+        system_context=system_context,
+        priority=priority,
+        source=source,
+        raise_errors=raise_errors
+    )
+
+def generate_starter(
+    subject_name: str,
+    assignment_type_name: str,
+    description: str,
+    on_delta: Optional[Callable[[str], None]] = None,
+    use_cache: bool = True,
+    priority: str = "interactive",
+    source: str = None,
+    on_queue: Optional[Callable[[Optional[int], Optional[float]], None]] = None
+) -> concurrent.futures.Future:
+    """Generate starter content (outline, key points, ideas) from an assignment description"""
+    return ai_handler.submit_response(
+        topic=f"Assignment Starter for {subject_name} - {assignment_type_name}",
+        context=f"Assignment Description: {description}",
+        role="assignment_starter",
+        use_cache=use_cache,
+        tags={"subject": subject_name, "assignment_type": assignment_type_name},
+        system_context=describe_assignment(subject_name, assignment_type_name),
+        on_delta=on_delta,
+        priority=priority,
+        source=source,
+        on_queue=on_queue
+    )
+
+def is_error_response(response: str) -> bool:
+    """Whether a response is an error message from ai_handler rather than generated text"""
+    return response.startswith(ai_handler.ERROR_PREFIXES)
+
+def build_export_note(kind: str, subject_name: str, assignment_type_name: str, input_label: str, input_text: str, output_label: str, output_text: str) -> Dict[str, str]:
+    """Title and content of a note holding an assignment and the text generated for it"""
+    note_content = f"SUBJECT: {subject_name}\n"
+    note_content += f"ASSIGNMENT TYPE: {assignment_type_name}\n\n"
+    note_content += f"{input_label}:\n{'-' * 80}\n{input_text}\n{'-' * 80}\n\n"
+    note_content += f"{output_label}:\n{'-' * 80}\n{output_text}\n{'-' * 80}\n"
+    
+    return {
+        "title": f"{kind}: {subject_name} - {assignment_type_name}",
+        "content": note_content
+    }
+
+def export_feedback_note(subject_name: str, assignment_type_name: str, assignment_text: str, feedback: str, title: str = None) -> Dict[str, str]:
+    """Save an assignment and its feedback as a new note and return it"""
+    note = build_export_note("Feedback", subject_name, assignment_type_name, "ASSIGNMENT TEXT", assignment_text, "FEEDBACK", feedback)
+    return save_new_note(title or note["title"], note["content"])
+
+def export_starter_note(subject_name: str, assignment_type_name: str, description: str, starter_content: str) -> Dict[str, str]:
+    """Save an assignment description and its starter content as a new note and return it"""
+    note = build_export_note("Starter", subject_name, assignment_type_name, "ASSIGNMENT DESCRIPTION", description, "STARTER CONTENT", starter_content)
+    return save_new_note(note["title"], note["content"])
+
+def save_new_note(title: str, content: str) -> Dict[str, str]:
+    """Save text as a new note and return it"""
+    note_data = {
+        "id": note_store.allocate_note_id(),
+        "title": title,
+        "content": content
+    }
+    note_store.save_note(note_data)
+    return note_data
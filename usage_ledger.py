@@ -0,0 +1,200 @@
+"""
+Record of every AI call the program makes
+
+ai_handler records the model, role, subject, token usage, latency and outcome
+of each call here, so it is possible to see which workloads use the quota and
+which are slow. Records are buffered and written in batches by the background
+writer. Print a summary from the command line:
+
+    python usage_ledger.py --by role --days 7
+"""
+import os
+import math
+import time
+import sqlite3
+import argparse
+import threading
+from typing import Any, Dict, List
+from dotenv import load_dotenv
+from constants import APP_DIR
+import persistence
+
+# Load environment variables from .env file
+load_dotenv()
+
+# Constants
+LEDGER_FILE = os.path.join(APP_DIR, "usage_ledger.sqlite3")
+LEDGER_ENABLED = os.getenv("USAGE_LEDGER_ENABLED", "true").strip().lower() not in ("0", "false", "no")
+
+# Columns of a call record, in table order
+FIELDS = [
+    "started_at", "model", "role", "subject", "assignment_type", "outcome", "error",
+    "prompt_tokens", "completion_tokens", "cached_tokens", "latency_ms", "ttft_ms", "attempts", "streamed"
+]
+
+# Ensure the app directory exists
+os.makedirs(APP_DIR, exist_ok=True)
+
+_lock = threading.Lock()
+_connection = None
+_buffer_lock = threading.Lock()
+_buffer = []  # Records waiting for the next batched write
+
+def _get_connection():
+    """Open the ledger database on first use"""
+    global _connection
+    if _connection is None:
+        _connection = sqlite3.connect(LEDGER_FILE, check_same_thread=False)
+        _connection.execute(
+            "CREATE TABLE IF NOT EXISTS calls ("
+            "id INTEGER PRIMARY KEY, "
+            "started_at REAL NOT NULL, "  # Unix time
+            "model TEXT, "
+            "role TEXT, "
+            "subject TEXT, "
+            "assignment_type TEXT, "
+            "outcome TEXT NOT NULL, "  # ok, cache_hit, shared, error or cancelled
+            "error TEXT, "
+            "prompt_tokens INTEGER, "
+            "completion_tokens INTEGER, "
+            "cached_tokens INTEGER, "
+            "latency_ms REAL, "
+            "ttft_ms REAL, "
+            "attempts INTEGER, "
+            "streamed INTEGER)"
+        )
+        _connection.execute("CREATE INDEX IF NOT EXISTS calls_started_at ON calls (started_at)")
+        _connection.commit()
+    return _connection
+
+def record(**call: Any):
+    """Add a call to the ledger (safe to call from any thread, the write happens in the background)"""
+    if not LEDGER_ENABLED:
+        return
+    
+    row = tuple(call.get(field) for field in FIELDS)
+    with _buffer_lock:
+        _buffer.append(row)
+    persistence.schedule_write("usage_ledger", _write_buffer)
+
+def _write_buffer():
+    """Write every buffered record in one transaction"""
+    with _buffer_lock:
+        rows = _buffer[:]
+        _buffer.clear()
+    if not rows:
+        return
+    
+    try:
+        with _lock:
+            connection = _get_connection()
+            connection.executemany(
+                f"INSERT INTO calls ({', '.join(FIELDS)}) VALUES ({', '.join('?' for _ in FIELDS)})", rows
+            )
+            connection.commit()
+    except Exception as e:
+        print(f"Error writing usage ledger: {e}")
+
+def percentile(values: List[float], fraction: float):
+    """Nearest-rank percentile of a list of numbers, or None if it is empty"""
+    if not values:
+        return None
+    values = sorted(values)
+    return values[max(0, math.ceil(fraction * len(values)) - 1)]
+
+def summarize(group_by: str = "role", days: float = None) -> List[Dict[str, Any]]:
+    """
+    Aggregate the ledger per day, role, subject, assignment type or model
+    
+    Returns one dict per group with call counts, token totals and latency
+    percentiles, sorted by group.
+    """
+    if group_by == "day":
+        group_expression = "date(started_at, 'unixepoch', 'localtime')"
+    elif group_by in ("role", "subject", "assignment_type", "model"):
+        group_expression = f"COALESCE({group_by}, '-')"
+    else:
+        raise ValueError(f"Can't group usage by {group_by}")
+    
+    since = time.time() - days * 24 * 60 * 60 if days else 0
+    with _lock:
+        rows = _get_connection().execute(
+            f"SELECT {group_expression}, outcome, prompt_tokens, completion_tokens, cached_tokens, latency_ms, ttft_ms "
+            f"FROM calls WHERE started_at >= ? ORDER BY started_at",
+            (since,)
+        ).fetchall()
+    
+    groups = {}
+    for group, outcome, prompt_tokens, completion_tokens, cached_tokens, latency_ms, ttft_ms in rows:
+        summary = groups.setdefault(group, {
+            "group": group, "calls": 0, "errors": 0, "cache_hits": 0, "shared": 0,
+            "prompt_tokens": 0, "completion_tokens": 0, "cached_tokens": 0,
+            "latencies": [], "ttfts": []
+        })
+        summary["calls"] += 1
+        if outcome == "error":
+            summary["errors"] += 1
+        elif outcome == "cache_hit":
+            summary["cache_hits"] += 1
+        elif outcome == "shared":
+            summary["shared"] += 1
+        summary["prompt_tokens"] += prompt_tokens or 0
+        summary["completion_tokens"] += completion_tokens or 0
+        summary["cached_tokens"] += cached_tokens or 0
+        
+        # Latency is only meaningful for calls that reached the API and finished
+        if outcome == "ok":
+            if latency_ms is not None:
+                summary["latencies"].append(latency_ms)
+            if ttft_ms is not None:
+                summary["ttfts"].append(ttft_ms)
+    
+    results = []
+    for group in sorted(groups):
+        summary = groups[group]
+        latencies = summary.pop("latencies")
+        ttfts = summary.pop("ttfts")
+        summary.update({
+            "latency_p50": percentile(latencies, 0.50),
+            "latency_p95": percentile(latencies, 0.95),
+            "latency_p99": percentile(latencies, 0.99),
+            "ttft_p50": percentile(ttfts, 0.50),
+            "ttft_p95": percentile(ttfts, 0.95)
+        })
+        results.append(summary)
+    return results
+
+def format_report(summaries: List[Dict[str, Any]], group_by: str) -> str:
+    """Format summaries as a plain text table"""
+    def ms(value):
+        return "-" if value is None else f"{value / 1000:.1f}s"
+    
+    def share(part, whole):
+        return "-" if not whole else f"{part / whole:.0%}"
+    
+    # "cached" counts responses served from the local cache, "shared" requests that
+    # waited for an identical one already in flight, "cached tok" prompt tokens the
+    # API served from its prompt cache
+    header = f"{group_by:<22} {'calls':>6} {'errors':>6} {'cached':>6} {'shared':>6} {'prompt tok':>11} {'cached tok':>11} {'cache %':>7} {'compl tok':>10}  {'p50':>6} {'p95':>6} {'p99':>6}  {'ttft p50':>8} {'ttft p95':>8}"
+    lines = [header, "-" * len(header)]
+    for summary in summaries:
+        lines.append(
+            f"{str(summary['group'])[:22]:<22} {summary['calls']:>6} {summary['errors']:>6} {summary['cache_hits']:>6} {summary['shared']:>6} "
+            f"{summary['prompt_tokens']:>11} {summary['cached_tokens']:>11} {share(summary['cached_tokens'], summary['prompt_tokens']):>7} {summary['completion_tokens']:>10}  "
+            f"{ms(summary['latency_p50']):>6} {ms(summary['latency_p95']):>6} {ms(summary['latency_p99']):>6}  "
+            f"{ms(summary['ttft_p50']):>8} {ms(summary['ttft_p95']):>8}"
+        )
+    if not summaries:
+        lines.append("No calls recorded")
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--by", default="role", choices=["day", "role", "subject", "assignment_type", "model"], help="How to group the calls (default: role)")
+    parser.add_argument("--days", type=float, help="Only include calls from the last N days")
+    args = parser.parse_args()
+    
+    print(format_report(summarize(args.by, args.days), args.by))
+
+if __name__ == "__main__":
+    main()